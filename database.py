@@ -1,5 +1,7 @@
 import os
+from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -17,6 +19,80 @@ users_col = db["users"]
 predictions_col = db["predictions"]
 reports_col = db["reports"]
 chat_col = db["chat_history"]
+# Per-user running totals, keyed by user email (see bump_user_counters)
+counters_col = db["user_counters"]
+
+# Attempts at seeding a user's counters before falling back to the
+# freshly counted (unsaved) totals
+COUNTER_SEED_ATTEMPTS = 3
+# How long a seed is trusted before the totals are recounted (see
+# get_user_counters for the drift this corrects)
+COUNTER_RESEED_INTERVAL = timedelta(hours=24)
 
 def col(name: str):
     return db[name]
+
+
+async def bump_user_counters(user_email: str, **increments: int):
+    """Increment a user's cached activity totals and stamp last_activity."""
+    # "revision" lets get_user_counters detect bumps that race its seeding
+    await counters_col.update_one(
+        {"_id": user_email},
+        {"$inc": {**increments, "revision": 1}, "$set": {"last_activity": datetime.utcnow()}},
+        upsert=True,
+    )
+
+
+async def get_user_counters(user_email: str) -> dict:
+    """
+    Return a user's cached activity totals.
+
+    Totals are seeded from the chat/prediction collections and then kept
+    up to date by bump_user_counters. A seed is only written if no bump
+    landed since the counter doc was read; otherwise the counts are
+    taken again.
+
+    The seed and the bumps are not atomic with the inserts they count:
+    an item inserted just before a seed whose bump lands just after it
+    is counted twice. Rather than lock the write paths, that drift is
+    bounded by recounting once the seed is older than
+    COUNTER_RESEED_INTERVAL.
+    """
+    for _ in range(COUNTER_SEED_ATTEMPTS):
+        existing = await counters_col.find_one({"_id": user_email})
+        seeded_at = existing.get("seeded_at") if existing else None
+        if seeded_at and datetime.utcnow() - seeded_at < COUNTER_RESEED_INTERVAL:
+            return existing
+
+        counters = {
+            "total_chats": await chat_col.count_documents(
+                {"user_email": user_email, "type": "chat_interaction"}
+            ),
+            "total_predictions": await predictions_col.count_documents({"user_email": user_email}),
+            "heart_predictions": await predictions_col.count_documents({"user_email": user_email, "type": "heart"}),
+            "alzheimer_predictions": await predictions_col.count_documents({"user_email": user_email, "type": "alzheimer"}),
+            "seeded_at": datetime.utcnow(),
+        }
+        if existing is None:
+            try:
+                await counters_col.insert_one({"_id": user_email, **counters})
+                return counters
+            except DuplicateKeyError:
+                continue
+        result = await counters_col.update_one(
+            {"_id": user_email, "revision": existing.get("revision")},
+            {"$set": counters, "$unset": {"seeded": ""}},
+        )
+        if result.modified_count:
+            return {**existing, **counters}
+    return counters
+
+async def ensure_indexes():
+    """Create the indexes the dashboard queries rely on (idempotent)."""
+    # Per-user history, message and daily-activity queries filter on
+    # user_email (+ type) and sort/range on timestamp
+    await chat_col.create_index([("user_email", 1), ("type", 1), ("timestamp", -1)])
+    await predictions_col.create_index([("user_email", 1), ("type", 1), ("timestamp", -1)])
+    await predictions_col.create_index([("user_email", 1), ("timestamp", -1)])
+    # Covers the per-user risk/type tally so it is served from the index alone
+    await predictions_col.create_index([("user_email", 1), ("risk_level", 1), ("type", 1)])
@@ -24,9 +24,11 @@ async def lifespan(app: FastAPI):
 
     # Startup
     try:
-        from database import db
+        from database import db, ensure_indexes
         await db.command("ping")
         logger.info("✅ Database connection established")
+        await ensure_indexes()
+        logger.info("✅ Database indexes ensured")
     except Exception as e:
         logger.error(f"❌ Database startup check failed: {e}")
         # DO NOT crash the app – let health endpoint show degraded state
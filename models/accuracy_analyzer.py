@@ -171,9 +171,9 @@ class AccuracyAnalyzer:
             overall_accuracy = (heart_acc * 0.4 + alzheimer_acc * 0.4 + chat_satisfaction * 0.2)
             
             # Get system usage statistics
-            total_users = await db.users_col.count_documents({})
-            total_predictions = await predictions_collection.count_documents({})
-            total_chats = await db.chat_history.count_documents({})
+            total_users = await db.users_col.estimated_document_count()
+            total_predictions = await predictions_collection.estimated_document_count()
+            total_chats = await db.chat_history.estimated_document_count()
             
             # Generate recommendations
             recommendations = self._generate_recommendations(heart_analysis, alzheimer_analysis, chat_analysis)
@@ -3,7 +3,7 @@ from typing import List, Dict, Any
 
 from fastapi import APIRouter, HTTPException, Depends, Query, status
 
-from database import users_col, predictions_col, reports_col, chat_col
+from database import users_col, predictions_col, reports_col, chat_col, counters_col
 from dependencies import get_current_admin
 from utils.email_service import send_email_async
 from routes.notifications import notify_user_event
@@ -58,10 +58,10 @@ def _derive_symptoms_from_messages(messages: List[str]) -> List[str]:
 # ============================
 @router.get("/overview")
 async def admin_overview(admin: dict = Depends(get_current_admin)):
-    total_users = await users_col.count_documents({})
+    total_users = await users_col.estimated_document_count()
     total_patients = await users_col.count_documents({"is_admin": {"$ne": True}})
-    total_predictions = await predictions_col.count_documents({})
-    total_chats = await chat_col.count_documents({})
+    total_predictions = await predictions_col.estimated_document_count()
+    total_chats = await chat_col.estimated_document_count()
 
     today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     week_ago = datetime.utcnow() - timedelta(days=7)
@@ -275,6 +275,7 @@ async def delete_user(
     await predictions_col.delete_many({"user_email": email})
     await chat_col.delete_many({"user_email": email})
     await reports_col.delete_many({"user_email": email})
+    await counters_col.delete_one({"_id": email})
     return {"status": "deleted"}
 
 
@@ -3,7 +3,7 @@ from dependencies import get_current_user
 from datetime import datetime, timedelta
 import json
 import re
-from database import users_col, predictions_col, reports_col, chat_col, db
+from database import users_col, predictions_col, reports_col, chat_col, db, bump_user_counters
 from utils.medicine_service import (
     detect_medical_condition,
     get_medicine_recommendations,
@@ -54,6 +54,7 @@ async def save_chat_history(
         
         # Save to a new chat_history collection
         await chat_col.insert_one(chat_entry)
+        await bump_user_counters(user_email, total_chats=1)
         print(f"✅ Chat history saved for user: {user_email}")
     except Exception as e:
         print(f"❌ Error saving chat history: {str(e)}")
@@ -4,7 +4,7 @@ from typing import Dict, Any
 
 import numpy as np
 
-from database import predictions_col
+from database import predictions_col, bump_user_counters
 from dependencies import get_current_user
 from models.hybrid_heart_model import predict_heart_disease
 from models.hybrid_alzheimer_model import predict_alzheimer_disease
@@ -87,6 +87,7 @@ async def heart(payload: dict, user: dict = Depends(get_current_user)):
     )
 
     await predictions_col.insert_one(doc)
+    await bump_user_counters(doc["user_email"], total_predictions=1, heart_predictions=1)
 
     return {
         "type": "heart",
@@ -116,6 +117,7 @@ async def alzheimer(payload: dict, user: dict = Depends(get_current_user)):
     )
 
     await predictions_col.insert_one(doc)
+    await bump_user_counters(doc["user_email"], total_predictions=1, alzheimer_predictions=1)
 
     return {
         "type": "alzheimer",
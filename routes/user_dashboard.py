@@ -5,33 +5,142 @@ Enhanced with PDF generation support
 """
 
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 from dependencies import get_current_user
-from database import db, predictions_col, chat_col
+from database import db, predictions_col, chat_col, get_user_counters
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, BinaryIO
+from io import BytesIO
+import asyncio
 import os
 import tempfile
+import time
+from jinja2 import Environment, FileSystemLoader, select_autoescape
 from routes.notifications import notify_admins_event
 
 router = APIRouter()
 
+# Report template is compiled once at import; autoescaping keeps user-supplied
+# chat text from being interpreted as markup.
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+_template_env = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=select_autoescape(["html", "j2"]),
+)
+_REPORT_TEMPLATE = _template_env.get_template("user_report.html.j2")
+
+# WeasyPrint stylesheet and font configuration are parsed once and shared by
+# every PDF render instead of re-parsing the inline <style> per request.
+try:
+    from weasyprint import HTML, CSS
+    try:
+        from weasyprint.text.fonts import FontConfiguration
+    except ImportError:  # WeasyPrint < 53
+        from weasyprint.fonts import FontConfiguration
+
+    _FONT_CONFIG = FontConfiguration()
+    _REPORT_CSS = CSS(
+        filename=os.path.join(TEMPLATES_DIR, "user_report.css"),
+        font_config=_FONT_CONFIG,
+    )
+except (ImportError, OSError):  # OSError: WeasyPrint installed without its native libs
+    HTML = None
+    _FONT_CONFIG = None
+    _REPORT_CSS = None
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib import colors
+except ImportError:
+    SimpleDocTemplate = None
+
+# Short-lived per-user cache of the dashboard payload so page refreshes and
+# polling within the TTL don't re-run the full set of dashboard queries.
+DASHBOARD_CACHE_TTL = 30  # seconds
+DASHBOARD_CACHE_MAX_ENTRIES = 10_000
+_dashboard_cache: Dict[str, tuple] = {}
+
+
+def _get_cached_dashboard(user_email: str):
+    entry = _dashboard_cache.get(user_email)
+    if entry is None:
+        return None
+    expires_at, payload = entry
+    if expires_at < time.monotonic():
+        _dashboard_cache.pop(user_email, None)
+        return None
+    return payload
+
+
+def _set_cached_dashboard(user_email: str, payload: dict) -> None:
+    now = time.monotonic()
+    if len(_dashboard_cache) >= DASHBOARD_CACHE_MAX_ENTRIES:
+        # Drop expired entries first; if still full, drop the oldest insertions
+        for email in [e for e, (exp, _) in _dashboard_cache.items() if exp < now]:
+            _dashboard_cache.pop(email, None)
+        while len(_dashboard_cache) >= DASHBOARD_CACHE_MAX_ENTRIES:
+            _dashboard_cache.pop(next(iter(_dashboard_cache)))
+    _dashboard_cache[user_email] = (now + DASHBOARD_CACHE_TTL, payload)
+
+
+# Synonyms seen in stored predictions, normalized to dashboard buckets
+_RISK_LEVEL_BUCKETS = {
+    **dict.fromkeys(["high", "critical", "severe"], "High"),
+    **dict.fromkeys(["medium", "moderate", "intermediate"], "Medium"),
+}
+_PREDICTION_TYPE_BUCKETS = {
+    **dict.fromkeys(["heart", "cardiac", "cardiovascular"], "heart"),
+    **dict.fromkeys(["alzheimer", "cognitive", "dementia", "memory"], "alzheimer"),
+}
+
+# The report renders at most the 10 most recent items of each kind
+REPORT_FETCH_LIMIT = 50
+# Size of the chunks a rendered report is streamed to the client in
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Fields actually returned/rendered by the history and report endpoints
+CHAT_HISTORY_PROJECTION = {
+    "_id": 0, "user_message": 1, "ai_response": 1, "condition": 1, "medicines": 1,
+    "timestamp": 1, "urgency": 1, "category": 1, "keywords": 1,
+}
+PREDICTION_HISTORY_PROJECTION = {
+    "_id": 0, "type": 1, "result": 1, "risk_percentage": 1, "risk_level": 1,
+    "confidence": 1, "timestamp": 1, "model_used": 1, "details": 1,
+}
+REPORT_CHAT_PROJECTION = {
+    "_id": 0, "user_message": 1, "ai_response": 1, "condition": 1, "timestamp": 1,
+}
+REPORT_PREDICTION_PROJECTION = {
+    "_id": 0, "type": 1, "result": 1, "risk_percentage": 1, "risk_level": 1,
+    "confidence": 1, "timestamp": 1,
+}
+
 @router.get("/user")
 async def get_user_dashboard(user: dict = Depends(get_current_user)):
     """Get user dashboard data with enhanced data structure for better visualization"""
     try:
         user_email = user.get("email")
+
+        cached = _get_cached_dashboard(user_email)
+        if cached is not None:
+            return cached
         
-        # Get user statistics
-        total_chats = await chat_col.count_documents(
-            {"user_email": user_email, "type": "chat_interaction"}
-        )
-        total_predictions = await predictions_col.count_documents({"user_email": user_email})
-        heart_predictions = await predictions_col.count_documents({"user_email": user_email, "type": "heart"})
-        alzheimer_predictions = await predictions_col.count_documents({"user_email": user_email, "type": "alzheimer"})
+        # Get user statistics from the per-user counter cache
+        counters = await get_user_counters(user_email)
+        total_chats = counters.get("total_chats", 0)
+        total_predictions = counters.get("total_predictions", 0)
+        heart_predictions = counters.get("heart_predictions", 0)
+        alzheimer_predictions = counters.get("alzheimer_predictions", 0)
         
+        # Day boundaries are computed from a single clock read
+        now = datetime.utcnow()
+        midnight = datetime.combine(now.date(), datetime.min.time())
+        one_day = timedelta(days=1)
+
         # Get recent activity (last 30 days)
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+        thirty_days_ago = now - timedelta(days=30)
         recent_chats = await chat_col.count_documents(
             {
                 "user_email": user_email,
@@ -45,25 +154,28 @@ async def get_user_dashboard(user: dict = Depends(get_current_user)):
         })
         
         # Get daily activity for the last 30 days with better formatting
+        # (newest first; the first 7 entries also feed the weekly summary)
+        daily_counts = []
         daily_activity = []
         for i in range(30):
-            date = (datetime.utcnow() - timedelta(days=i)).date()
-            start_date = datetime.combine(date, datetime.min.time())
-            end_date = datetime.combine(date, datetime.max.time())
+            start_date = midnight - i * one_day
+            end_date = start_date + one_day
+            date = start_date.date()
             
             daily_chats = await chat_col.count_documents(
                 {
                     "user_email": user_email,
                     "type": "chat_interaction",
-                    "timestamp": {"$gte": start_date, "$lte": end_date},
+                    "timestamp": {"$gte": start_date, "$lt": end_date},
                 }
             )
             
             daily_predictions = await predictions_col.count_documents({
                 "user_email": user_email,
-                "timestamp": {"$gte": start_date, "$lte": end_date}
+                "timestamp": {"$gte": start_date, "$lt": end_date}
             })
             
+            daily_counts.append((date, daily_chats, daily_predictions))
             daily_activity.append({
                 "date": date.strftime("%m/%d"),  # Shorter date format for better display
                 "fullDate": date.strftime("%Y-%m-%d"),
@@ -78,25 +190,15 @@ async def get_user_dashboard(user: dict = Depends(get_current_user)):
         risk_distribution = {"Low": 0, "Medium": 0, "High": 0}
         prediction_types = {"heart": 0, "alzheimer": 0, "other": 0}
         
-        async for prediction in predictions_col.find({"user_email": user_email}):
+        async for prediction in predictions_col.find(
+            {"user_email": user_email}, {"_id": 0, "risk_level": 1, "type": 1}
+        ):
             risk_level = prediction.get("risk_level", "Low")
             pred_type = prediction.get("type", "other")
             
-            # Normalize risk level
-            if risk_level.lower() in ["high", "critical", "severe"]:
-                risk_distribution["High"] += 1
-            elif risk_level.lower() in ["medium", "moderate", "intermediate"]:
-                risk_distribution["Medium"] += 1
-            else:
-                risk_distribution["Low"] += 1
-            
-            # Normalize prediction type
-            if pred_type.lower() in ["heart", "cardiac", "cardiovascular"]:
-                prediction_types["heart"] += 1
-            elif pred_type.lower() in ["alzheimer", "cognitive", "dementia", "memory"]:
-                prediction_types["alzheimer"] += 1
-            else:
-                prediction_types["other"] += 1
+            # Normalize risk level and prediction type
+            risk_distribution[_RISK_LEVEL_BUCKETS.get(risk_level.lower(), "Low")] += 1
+            prediction_types[_PREDICTION_TYPE_BUCKETS.get(pred_type.lower(), "other")] += 1
         
         # Format data for pie charts
         risk_data = [
@@ -113,24 +215,7 @@ async def get_user_dashboard(user: dict = Depends(get_current_user)):
         
         # Get recent activity summary
         recent_activity_summary = []
-        for i in range(7):  # Last 7 days
-            date = (datetime.utcnow() - timedelta(days=i)).date()
-            start_date = datetime.combine(date, datetime.min.time())
-            end_date = datetime.combine(date, datetime.max.time())
-            
-            day_chats = await chat_col.count_documents(
-                {
-                    "user_email": user_email,
-                    "type": "chat_interaction",
-                    "timestamp": {"$gte": start_date, "$lte": end_date},
-                }
-            )
-            
-            day_predictions = await predictions_col.count_documents({
-                "user_email": user_email,
-                "timestamp": {"$gte": start_date, "$lte": end_date}
-            })
-            
+        for date, day_chats, day_predictions in daily_counts[:7]:  # Last 7 days
             recent_activity_summary.append({
                 "day": date.strftime("%a"),  # Mon, Tue, etc.
                 "date": date.strftime("%m/%d"),
@@ -140,8 +225,21 @@ async def get_user_dashboard(user: dict = Depends(get_current_user)):
             })
         
         recent_activity_summary.reverse()
+
+        # Engagement metrics in a single pass over daily_activity
+        peak_activity, most_active_day = -1, None
+        total_days_active = streak_days = 0
+        streak_start = len(daily_activity) - 7  # Last 7 days
+        for i, day in enumerate(daily_activity):
+            day_total = day["total"]
+            if day_total > peak_activity:
+                peak_activity, most_active_day = day_total, day["date"]
+            if day_total > 0:
+                total_days_active += 1
+                if i >= streak_start:
+                    streak_days += 1
         
-        return {
+        dashboard = {
             "user": {
                 "email": user_email,
                 "is_admin": user.get("is_admin", False),
@@ -164,12 +262,15 @@ async def get_user_dashboard(user: dict = Depends(get_current_user)):
             "prediction_types": prediction_types,
             "prediction_type_data": prediction_type_data,
             "engagement_metrics": {
-                "most_active_day": max(daily_activity, key=lambda x: x["total"])["date"] if daily_activity else None,
-                "total_days_active": len([day for day in daily_activity if day["total"] > 0]),
-                "streak_days": len([day for day in daily_activity[-7:] if day["total"] > 0]),  # Last 7 days
-                "peak_activity": max([day["total"] for day in daily_activity]) if daily_activity else 0
+                "most_active_day": most_active_day,
+                "total_days_active": total_days_active,
+                "streak_days": streak_days,
+                "peak_activity": max(peak_activity, 0)
             }
         }
+
+        _set_cached_dashboard(user_email, dashboard)
+        return dashboard
         
     except Exception as e:
         print(f"Error getting user dashboard: {str(e)}")
@@ -181,13 +282,19 @@ async def get_user_chat_history(user: dict = Depends(get_current_user)):
     try:
         user_email = user.get("email")
         
-        chat_history = []
-        async for chat in (
-            chat_col.find({"user_email": user_email, "type": "chat_interaction"})
+        chats = await (
+            chat_col.find(
+                {"user_email": user_email, "type": "chat_interaction"},
+                CHAT_HISTORY_PROJECTION,
+            )
             .sort("timestamp", -1)
             .limit(50)
-        ):
-            chat_history.append({
+            .batch_size(50)
+            .to_list(length=50)
+        )
+
+        chat_history = [
+            {
                 "user_message": chat["user_message"],
                 "ai_response": chat["ai_response"],
                 "condition": chat.get("condition"),
@@ -196,7 +303,9 @@ async def get_user_chat_history(user: dict = Depends(get_current_user)):
                 "urgency": chat.get("urgency"),
                 "category": chat.get("category"),
                 "keywords": chat.get("keywords", [])
-            })
+            }
+            for chat in chats
+        ]
         
         return chat_history
         
@@ -325,9 +434,16 @@ async def get_user_predictions(user: dict = Depends(get_current_user)):
     try:
         user_email = user.get("email")
         
-        predictions = []
-        async for prediction in predictions_col.find({"user_email": user_email}).sort("timestamp", -1).limit(50):
-            predictions.append({
+        docs = await (
+            predictions_col.find({"user_email": user_email}, PREDICTION_HISTORY_PROJECTION)
+            .sort("timestamp", -1)
+            .limit(50)
+            .batch_size(50)
+            .to_list(length=50)
+        )
+
+        predictions = [
+            {
                 "type": prediction["type"],
                 "result": prediction["result"],
                 "risk_percentage": prediction.get("risk_percentage", 0),
@@ -336,7 +452,9 @@ async def get_user_predictions(user: dict = Depends(get_current_user)):
                 "timestamp": prediction["timestamp"],
                 "model_used": prediction.get("model_used", "unknown"),
                 "details": prediction.get("details", {})
-            })
+            }
+            for prediction in docs
+        ]
         
         return predictions
         
@@ -353,37 +471,65 @@ def _fmt_ts(ts) -> str:
     return str(ts)
 
 
+async def _iter_buffer(buffer: BytesIO, chunk_size: int = STREAM_CHUNK_SIZE):
+    """Yield a buffer's contents in fixed-size chunks without copying it whole."""
+    try:
+        view = buffer.getbuffer()
+        try:
+            for start in range(0, len(view), chunk_size):
+                yield bytes(view[start:start + chunk_size])
+        finally:
+            view.release()
+    finally:
+        buffer.close()
+
+
 @router.get("/user/download-report")
 async def download_user_report(user: dict = Depends(get_current_user)):
     """Download user's personal medical report as PDF or HTML"""
     try:
         user_email = user.get("email")
         
-        # Only AI consultations (chat_interaction) for report
-        chat_history = []
-        async for chat in chat_col.find(
-            {"user_email": user_email, "type": "chat_interaction"}
-        ).sort("timestamp", -1):
-            chat_history.append(chat)
-        
-        predictions = []
-        async for prediction in predictions_col.find({"user_email": user_email}).sort("timestamp", -1):
-            predictions.append(prediction)
+        # Only AI consultations (chat_interaction) for report; both
+        # collections are read concurrently
+        chat_history, predictions, counters = await asyncio.gather(
+            chat_col.find(
+                {"user_email": user_email, "type": "chat_interaction"},
+                REPORT_CHAT_PROJECTION,
+            ).sort("timestamp", -1).limit(REPORT_FETCH_LIMIT).to_list(length=REPORT_FETCH_LIMIT),
+            predictions_col.find(
+                {"user_email": user_email}, REPORT_PREDICTION_PROJECTION
+            ).sort("timestamp", -1).limit(REPORT_FETCH_LIMIT).to_list(length=REPORT_FETCH_LIMIT),
+            get_user_counters(user_email),
+        )
+        # Lifetime totals come from the counter cache since the lists are capped
+        stats = {
+            "consultations": counters.get("total_chats", 0),
+            "predictions": counters.get("total_predictions", 0),
+            "heart": counters.get("heart_predictions", 0),
+            "alzheimer": counters.get("alzheimer_predictions", 0),
+        }
         
-        # Try to generate PDF, fallback to HTML if PDF generation fails
-        try:
-            pdf_content = generate_user_report_pdf(user_email, chat_history, predictions)
-            if pdf_content:
-                return Response(
-                    content=pdf_content,
-                    media_type="application/pdf",
-                    headers={"Content-Disposition": f"attachment; filename=medical_report_{user_email}_{datetime.now().strftime('%Y%m%d')}.pdf"}
+        # Try to generate PDF, fallback to HTML if PDF generation fails.
+        # Without a PDF backend HTML is the final output, so skip straight to it.
+        if PDF_AVAILABLE:
+            try:
+                # PDF rendering is CPU-bound; keep it off the event loop
+                pdf_buffer = BytesIO()
+                rendered = await asyncio.to_thread(
+                    write_user_report_pdf, pdf_buffer, user_email, chat_history, predictions, stats
                 )
-        except Exception as pdf_error:
-            print(f" PDF generation failed, falling back to HTML: {pdf_error}")
+                if rendered and pdf_buffer.tell():
+                    return StreamingResponse(
+                        _iter_buffer(pdf_buffer),
+                        media_type="application/pdf",
+                        headers={"Content-Disposition": f"attachment; filename=medical_report_{user_email}_{datetime.now().strftime('%Y%m%d')}.pdf"}
+                    )
+            except Exception as pdf_error:
+                print(f" PDF generation failed, falling back to HTML: {pdf_error}")
         
         # Fallback to HTML
-        html_content = generate_user_report_html(user_email, chat_history, predictions)
+        html_content = generate_user_report_html(user_email, chat_history, predictions, stats)
         return Response(
             content=html_content,
             media_type="text/html",
@@ -394,355 +540,185 @@ async def download_user_report(user: dict = Depends(get_current_user)):
         print(f"Error generating user report: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to generate user report")
 
-def generate_user_report_pdf(user_email: str, chat_history: List[Dict], predictions: List[Dict]) -> bytes:
+def _report_stats(chat_history: List[Dict], predictions: List[Dict], stats: Dict[str, int] = None) -> Dict[str, int]:
+    """Report usage statistics; derived from the given lists when no totals are supplied."""
+    if stats is not None:
+        return stats
+    return {
+        "consultations": len(chat_history),
+        "predictions": len(predictions),
+        "heart": len([p for p in predictions if (p.get('type') or '').lower() == 'heart']),
+        "alzheimer": len([p for p in predictions if (p.get('type') or '').lower() == 'alzheimer']),
+    }
+
+
+def generate_user_report_pdf(user_email: str, chat_history: List[Dict], predictions: List[Dict], stats: Dict[str, int] = None) -> bytes:
     """Generate PDF report using weasyprint or reportlab"""
+    buffer = BytesIO()
+    if not write_user_report_pdf(buffer, user_email, chat_history, predictions, stats):
+        return None
+    return buffer.getvalue()
+
+
+def write_user_report_pdf(
+    target: BinaryIO,
+    user_email: str,
+    chat_history: List[Dict],
+    predictions: List[Dict],
+    stats: Dict[str, int] = None,
+) -> bool:
+    """Write the PDF report into `target`; returns False if no PDF backend could render it"""
+    if not PDF_AVAILABLE:
+        print(" Neither WeasyPrint nor ReportLab is available, cannot generate PDF")
+        return False
+    stats = _report_stats(chat_history, predictions, stats)
     try:
-        # Try using weasyprint first (better HTML to PDF conversion)
-        try:
-            from weasyprint import HTML, CSS
-            html_content = generate_user_report_html(user_email, chat_history, predictions)
-            
-            # Create PDF from HTML
-            pdf_bytes = HTML(string=html_content).write_pdf()
-            return pdf_bytes
-            
-        except ImportError:
-            print(" WeasyPrint not available, trying ReportLab...")
-            
-            # Fallback to ReportLab
-            try:
-                from reportlab.lib.pagesizes import letter, A4
-                from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-                from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-                from reportlab.lib.units import inch
-                from reportlab.lib import colors
-                from io import BytesIO
-                
-                # Create PDF buffer
-                buffer = BytesIO()
-                doc = SimpleDocTemplate(buffer, pagesize=A4)
-                
-                # Get styles
-                styles = getSampleStyleSheet()
-                title_style = ParagraphStyle(
-                    'CustomTitle',
-                    parent=styles['Heading1'],
-                    fontSize=24,
-                    spaceAfter=30,
-                    textColor=colors.HexColor('#667eea')
-                )
-                
-                # Build story
-                story = []
-                
-                # Title
-                story.append(Paragraph("Medical AI Report", title_style))
-                story.append(Paragraph(f"Generated for: {user_email}", styles['Normal']))
-                story.append(Paragraph(f"Date: {datetime.now().strftime('%B %d, %Y')}", styles['Normal']))
-                story.append(Spacer(1, 20))
-                
-                # Statistics
-                story.append(Paragraph("Usage Statistics", styles['Heading2']))
-                
-                stats_data = [
-                    ['Metric', 'Count'],
-                    ['AI Consultations', str(len(chat_history))],
-                    ['Health Predictions', str(len(predictions))],
-                    ['Heart Assessments', str(len([p for p in predictions if (p.get('type') or '').lower() == 'heart']))],
-                    ['Cognitive Assessments', str(len([p for p in predictions if (p.get('type') or '').lower() == 'alzheimer']))]
-                ]
-                
-                stats_table = Table(stats_data)
-                stats_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 14),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                ]))
-                
-                story.append(stats_table)
-                story.append(Spacer(1, 20))
-                
-                # Recent Predictions
-                if predictions:
-                    story.append(Paragraph("Recent Health Predictions", styles['Heading2']))
-                    
-                    for pred in predictions[:5]:
-                        ptype = pred.get("type") or "unknown"
-                        result = pred.get("result") or "—"
-                        pct = pred.get("risk_percentage", 0)
-                        level = pred.get("risk_level", "Low")
-                        ts = _fmt_ts(pred.get("timestamp"))
-                        lines = [f"Type: {str(ptype).title()}", f"Result: {result}", f"Risk: {pct}% - {level}", f"Date: {ts}"]
-                        story.append(Paragraph("<br/>".join(lines), styles['Normal']))
-                        story.append(Spacer(1, 12))
-                
-                # Build PDF
-                doc.build(story)
-                
-                # Get PDF bytes
-                pdf_bytes = buffer.getvalue()
-                buffer.close()
-                
-                return pdf_bytes
-                
-            except ImportError:
-                print(" ReportLab not available, cannot generate PDF")
-                return None
-                
+        _write_pdf(target, user_email, chat_history, predictions, stats)
+        return True
     except Exception as e:
         print(f" Error generating PDF: {e}")
-        return None
+        return False
+
+
+def _write_pdf_weasyprint(target: BinaryIO, user_email: str, chat_history: List[Dict], predictions: List[Dict], stats: Dict[str, int]) -> None:
+    """HTML-to-PDF via WeasyPrint (preferred: reuses the HTML report layout)"""
+    html_content = generate_user_report_html(
+        user_email, chat_history, predictions, stats, embed_styles=False
+    )
+    # Create PDF from HTML with the shared stylesheet/font config
+    HTML(string=html_content).write_pdf(
+        target=target, stylesheets=[_REPORT_CSS], font_config=_FONT_CONFIG
+    )
 
-def generate_user_report_html(user_email: str, chat_history: List[Dict], predictions: List[Dict]) -> str:
-    """Generate a beautiful HTML report for the user"""
+
+def _write_pdf_reportlab(target: BinaryIO, user_email: str, chat_history: List[Dict], predictions: List[Dict], stats: Dict[str, int]) -> None:
+    """Simplified PDF via ReportLab, used when WeasyPrint is unavailable"""
+    doc = SimpleDocTemplate(target, pagesize=A4)
     
-    html = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Medical AI Report - {user_email}</title>
-        <style>
-            body {{
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                line-height: 1.6;
-                margin: 0;
-                padding: 20px;
-                background-color: #f5f7fa;
-                color: #333;
-            }}
-            .container {{
-                max-width: 1200px;
-                margin: 0 auto;
-                background: white;
-                border-radius: 10px;
-                box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-                overflow: hidden;
-            }}
-            .header {{
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                padding: 30px;
-                text-align: center;
-            }}
-            .header h1 {{
-                margin: 0;
-                font-size: 2.5em;
-                font-weight: 300;
-            }}
-            .header p {{
-                margin: 10px 0 0 0;
-                opacity: 0.9;
-                font-size: 1.1em;
-            }}
-            .content {{
-                padding: 30px;
-            }}
-            .section {{
-                margin-bottom: 40px;
-            }}
-            .section h2 {{
-                color: #667eea;
-                border-bottom: 2px solid #e0e6ed;
-                padding-bottom: 10px;
-                margin-bottom: 20px;
-            }}
-            .stats-grid {{
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-                gap: 20px;
-                margin-bottom: 30px;
-            }}
-            .stat-card {{
-                background: #f8f9fa;
-                padding: 20px;
-                border-radius: 8px;
-                text-align: center;
-                border-left: 4px solid #667eea;
-            }}
-            .stat-number {{
-                font-size: 2em;
-                font-weight: bold;
-                color: #667eea;
-                margin-bottom: 5px;
-            }}
-            .stat-label {{
-                color: #666;
-                font-size: 0.9em;
-            }}
-            .prediction-item {{
-                background: #f8f9fa;
-                padding: 20px;
-                margin-bottom: 15px;
-                border-radius: 8px;
-                border-left: 4px solid #28a745;
-            }}
-            .prediction-header {{
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-                margin-bottom: 10px;
-            }}
-            .prediction-type {{
-                background: #667eea;
-                color: white;
-                padding: 5px 15px;
-                border-radius: 20px;
-                font-size: 0.8em;
-                font-weight: bold;
-            }}
-            .risk-level {{
-                padding: 5px 10px;
-                border-radius: 15px;
-                font-size: 0.8em;
-                font-weight: bold;
-            }}
-            .risk-high {{ background: #dc3545; color: white; }}
-            .risk-medium {{ background: #ffc107; color: #333; }}
-            .risk-low {{ background: #28a745; color: white; }}
-            .chat-item {{
-                background: #f8f9fa;
-                padding: 20px;
-                margin-bottom: 15px;
-                border-radius: 8px;
-                border-left: 4px solid #17a2b8;
-            }}
-            .chat-message {{
-                margin-bottom: 10px;
-            }}
-            .chat-response {{
-                background: white;
-                padding: 15px;
-                border-radius: 5px;
-                margin-top: 10px;
-            }}
-            .condition-tag {{
-                background: #6f42c1;
-                color: white;
-                padding: 3px 8px;
-                border-radius: 10px;
-                font-size: 0.7em;
-                margin-left: 10px;
-            }}
-            .timestamp {{
-                color: #666;
-                font-size: 0.8em;
-            }}
-            .footer {{
-                background: #f8f9fa;
-                padding: 20px;
-                text-align: center;
-                color: #666;
-                border-top: 1px solid #e0e6ed;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>🏥 Medical AI Report</h1>
-                <p>Personal Health Analytics & AI Consultations</p>
-                <p>Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')}</p>
-            </div>
-            
-            <div class="content">
-                <div class="section">
-                    <h2>📊 Usage Statistics</h2>
-                    <div class="stats-grid">
-                        <div class="stat-card">
-                            <div class="stat-number">{len(chat_history)}</div>
-                            <div class="stat-label">AI Consultations</div>
-                        </div>
-                        <div class="stat-card">
-                            <div class="stat-number">{len(predictions)}</div>
-                            <div class="stat-label">Health Predictions</div>
-                        </div>
-                        <div class="stat-card">
-                            <div class="stat-number">{len([p for p in predictions if (p.get('type') or '').lower() == 'heart'])}</div>
-                            <div class="stat-label">Heart Assessments</div>
-                        </div>
-                        <div class="stat-card">
-                            <div class="stat-number">{len([p for p in predictions if (p.get('type') or '').lower() == 'alzheimer'])}</div>
-                            <div class="stat-label">Cognitive Assessments</div>
-                        </div>
-                    </div>
-                </div>
-                
-                <div class="section">
-                    <h2>🔮 Health Predictions</h2>
-    """
+    # Get styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        spaceAfter=30,
+        textColor=colors.HexColor('#667eea')
+    )
     
+    # Build story
+    story = []
+    
+    # Title
+    story.append(Paragraph("Medical AI Report", title_style))
+    story.append(Paragraph(f"Generated for: {user_email}", styles['Normal']))
+    story.append(Paragraph(f"Date: {datetime.now().strftime('%B %d, %Y')}", styles['Normal']))
+    story.append(Spacer(1, 20))
+    
+    # Statistics
+    story.append(Paragraph("Usage Statistics", styles['Heading2']))
+    
+    stats_data = [
+        ['Metric', 'Count'],
+        ['AI Consultations', str(stats["consultations"])],
+        ['Health Predictions', str(stats["predictions"])],
+        ['Heart Assessments', str(stats["heart"])],
+        ['Cognitive Assessments', str(stats["alzheimer"])]
+    ]
+    
+    stats_table = Table(stats_data)
+    stats_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 14),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    
+    story.append(stats_table)
+    story.append(Spacer(1, 20))
+    
+    # Recent Predictions
     if predictions:
-        for pred in predictions[:10]:
-            ptype = (pred.get("type") or "unknown").lower()
-            risk_class = f"risk-{(pred.get('risk_level') or 'low').lower()}"
-            pct = pred.get("risk_percentage", 0)
-            level = pred.get("risk_level") or "Low"
+        story.append(Paragraph("Recent Health Predictions", styles['Heading2']))
+        
+        for pred in predictions[:5]:
+            ptype = pred.get("type") or "unknown"
             result = pred.get("result") or "—"
-            conf = pred.get("confidence", 0)
-            try:
-                conf_pct = f"{float(conf):.1%}"
-            except (TypeError, ValueError):
-                conf_pct = "—"
+            pct = pred.get("risk_percentage", 0)
+            level = pred.get("risk_level", "Low")
             ts = _fmt_ts(pred.get("timestamp"))
-            html += f"""
-                    <div class="prediction-item">
-                        <div class="prediction-header">
-                            <span class="prediction-type">{(pred.get('type') or 'unknown').title()}</span>
-                            <span class="risk-level {risk_class}">{pct}% Risk - {level}</span>
-                        </div>
-                        <div class="prediction-message">
-                            <strong>Result:</strong> {result}<br>
-                            <strong>Confidence:</strong> {conf_pct}<br>
-                            <span class="timestamp">{ts}</span>
-                        </div>
-                    </div>
-            """
-    else:
-        html += "<p>No predictions available yet.</p>"
+            lines = [f"Type: {str(ptype).title()}", f"Result: {result}", f"Risk: {pct}% - {level}", f"Date: {ts}"]
+            story.append(Paragraph("<br/>".join(lines), styles['Normal']))
+            story.append(Spacer(1, 12))
     
-    html += """
-                </div>
-                
-                <div class="section">
-                    <h2>💬 AI Consultations</h2>
+    # Build PDF
+    doc.build(story)
+
+
+# PDF backend is chosen once at import: WeasyPrint if usable, else ReportLab
+if HTML is not None:
+    _write_pdf = _write_pdf_weasyprint
+elif SimpleDocTemplate is not None:
+    _write_pdf = _write_pdf_reportlab
+else:
+    _write_pdf = None
+
+PDF_AVAILABLE = _write_pdf is not None
+
+def _report_prediction_rows(predictions: List[Dict]) -> List[Dict[str, Any]]:
+    rows = []
+    for pred in predictions:
+        conf = pred.get("confidence", 0)
+        try:
+            conf_pct = f"{float(conf):.1%}"
+        except (TypeError, ValueError):
+            conf_pct = "—"
+        rows.append({
+            "type_label": (pred.get("type") or "unknown").title(),
+            "risk_class": f"risk-{(pred.get('risk_level') or 'low').lower()}",
+            "risk_percentage": pred.get("risk_percentage", 0),
+            "risk_level": pred.get("risk_level") or "Low",
+            "result": pred.get("result") or "—",
+            "confidence": conf_pct,
+            "timestamp": _fmt_ts(pred.get("timestamp")),
+        })
+    return rows
+
+
+def _report_chat_rows(chat_history: List[Dict]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "user_message": chat.get("user_message") or "",
+            "ai_response": chat.get("ai_response") or "",
+            "condition": chat.get("condition"),
+            "timestamp": _fmt_ts(chat.get("timestamp")),
+        }
+        for chat in chat_history
+    ]
+
+
+def generate_user_report_html(
+    user_email: str,
+    chat_history: List[Dict],
+    predictions: List[Dict],
+    stats: Dict[str, int] = None,
+    embed_styles: bool = True,
+) -> str:
     """
-    
-    if chat_history:
-        for chat in chat_history[:10]:
-            um = chat.get("user_message") or ""
-            ar = chat.get("ai_response") or ""
-            cond = chat.get("condition")
-            condition_tag = f'<span class="condition-tag">{cond}</span>' if cond else ''
-            ts = _fmt_ts(chat.get("timestamp"))
-            html += f"""
-                    <div class="chat-item">
-                        <div class="chat-message"><strong>You:</strong> {um}</div>
-                        <div class="chat-response"><strong>AI Assistant:</strong> {ar} {condition_tag}</div>
-                        <span class="timestamp">{ts}</span>
-                    </div>
-            """
-    else:
-        html += "<p>No chat history available yet.</p>"
-    
-    html += f"""
-                </div>
-            </div>
-            
-            <div class="footer">
-                <p>This report was generated by Medical AI Assistant</p>
-                <p>For user: {user_email}</p>
-                <p><em>This report is for informational purposes only and should not replace professional medical advice.</em></p>
-            </div>
-        </div>
-    </body>
-    </html>
+    Generate a beautiful HTML report for the user.
+
+    `embed_styles=False` omits the inline <style> block, for renderers that
+    apply the report stylesheet themselves (the WeasyPrint PDF path).
     """
-    
-    return html
\ No newline at end of file
+    stats = _report_stats(chat_history, predictions, stats)
+    return _REPORT_TEMPLATE.render(
+        embed_styles=embed_styles,
+        user_email=user_email,
+        stats=stats,
+        predictions=_report_prediction_rows(predictions[:10]),
+        chat_history=_report_chat_rows(chat_history[:10]),
+        generated_at=datetime.now(),
+    )
@@ -7,6 +7,9 @@ from dependencies import get_current_user
 router = APIRouter(prefix="/voice-assistant", tags=["Voice Assistant"])
 logger = logging.getLogger(__name__)
 
+# Longest text /speak will synthesize
+SPEAK_MAX_CHARS = 1000
+
 _voice_assistant = None
 
 def get_voice_assistant():
@@ -31,3 +34,21 @@ async def public(file: UploadFile = File(...), language_hint: Optional[str] = Fo
         raise HTTPException(503, "Voice unavailable")
     audio = await file.read()
     return {"ok": True, "bytes": len(audio)}
+
+@router.post("/speak")
+async def speak(
+    text: str = Form(..., max_length=SPEAK_MAX_CHARS),
+    language: str = Form("en"),
+    user: dict = Depends(get_current_user),
+):
+    """
+    Stream synthesized speech for `text`; audio starts arriving after the
+    first sentence is ready rather than once the whole reply is synthesized
+    """
+    va = get_voice_assistant()
+    if not va:
+        raise HTTPException(503, "Voice unavailable")
+    media_type, chunks = await va.tts_handler.text_to_speech_stream(text, language)
+    if chunks is None:
+        raise HTTPException(502, "Speech synthesis failed")
+    return StreamingResponse(chunks, media_type=media_type)
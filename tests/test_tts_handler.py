@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+tts_module = pytest.importorskip("voice_assistant.tts_handler")
+TTSHandler = tts_module.TTSHandler
+
+MP3_CLIP = b"ID3-fake-mp3"
+WAV_CLIP = b"RIFF-fake-wav"
+
+
+class FlakyGTTS:
+    """gTTS stand-in whose first synthesis fails, as during a brief outage"""
+
+    failures_left = 1
+
+    def __init__(self, text, lang, slow=False):
+        self.text = text
+
+    def _audio(self):
+        if FlakyGTTS.failures_left:
+            FlakyGTTS.failures_left -= 1
+            raise ConnectionError("gTTS unreachable")
+        return MP3_CLIP
+
+    def write_to_fp(self, fp):
+        fp.write(self._audio())
+
+
+def fake_offline_tts(self, text, language):
+    return {"audio_data": WAV_CLIP, "success": True, "method": "pyttsx3", "language": language}
+
+
+@pytest.fixture
+def handler(monkeypatch, tmp_path):
+    FlakyGTTS.failures_left = 1
+    monkeypatch.setattr(tts_module, "gTTS", FlakyGTTS)
+    monkeypatch.setattr(TTSHandler, "_offline_tts", fake_offline_tts)
+    tts = TTSHandler(cache_dir=str(tmp_path), prewarm_static=False)
+    tts.offline_available = True
+    return tts
+
+
+def test_offline_fallback_is_not_cached_under_gtts_key(handler, tmp_path):
+    outage = handler.text_to_speech("Hello there", "en")
+    assert outage["method"] == "pyttsx3"
+    assert outage["audio_data"] == WAV_CLIP
+    assert not list(tmp_path.iterdir())
+
+    recovered = handler.text_to_speech("Hello there", "en")
+    assert recovered["method"] == "gTTS"
+    assert recovered["audio_data"] == MP3_CLIP
+
+    cached = handler.text_to_speech("Hello there", "en")
+    assert cached["method"] == "cache"
+    assert cached["audio_data"] == MP3_CLIP
+
+
+async def _collect(handler, text):
+    media_type, chunks = await handler.text_to_speech_stream(text, "en")
+    return media_type, [chunk async for chunk in chunks]
+
+
+def test_stream_resynthesizes_non_mp3_cache_hit(handler):
+    FlakyGTTS.failures_left = 0
+    poisoned_key = handler._cache_key("Second one.", "en", False)
+    handler._cache_put(poisoned_key, WAV_CLIP)
+
+    media_type, chunks = asyncio.run(_collect(handler, "First one. Second one."))
+
+    assert media_type == "audio/mpeg"
+    assert chunks == [MP3_CLIP, MP3_CLIP]
+    assert handler._cache_get(poisoned_key) == MP3_CLIP
+
+
+def test_stream_fails_instead_of_truncating(handler, monkeypatch):
+    class GTTSDownAfterFirstSentence(FlakyGTTS):
+        def _audio(self):
+            if "Second" in self.text:
+                raise ConnectionError("gTTS unreachable")
+            return MP3_CLIP
+
+    monkeypatch.setattr(tts_module, "gTTS", GTTSDownAfterFirstSentence)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(_collect(handler, "First one. Second one."))
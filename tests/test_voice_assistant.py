@@ -0,0 +1,43 @@
+import pytest
+
+va_module = pytest.importorskip("voice_assistant.voice_assistant")
+VoiceAssistant = va_module.VoiceAssistant
+
+
+@pytest.fixture
+def assistant():
+    va = VoiceAssistant.__new__(VoiceAssistant)
+    va._response_cache = va_module.OrderedDict()
+    va._response_cache_lock = va_module.threading.Lock()
+    return va
+
+
+def _turn(intent):
+    entities = {'intent': intent, 'symptoms': ['chest'], 'raw_text': 'chest'}
+    response_data = {'success': True, 'prediction_type': intent, 'response_params': {'symptoms': 'chest'}}
+    tts_result = {'success': True, 'audio_data': b'ID3', 'method': 'gTTS'}
+    return entities, response_data, tts_result
+
+
+@pytest.mark.parametrize('intent', ['heart', 'alzheimer', 'appointment', 'contact'])
+def test_turns_with_backend_side_effects_are_not_cached(assistant, intent):
+    key = assistant._response_cache_key('chest pain', 'en')
+    entities, response_data, tts_result = _turn(intent)
+    assistant._cache_response(key, entities, response_data, 'reply', tts_result)
+    assert assistant._get_cached_response(key) is None
+
+
+def test_cache_hits_are_independent_copies(assistant):
+    key = assistant._response_cache_key('hello', 'en')
+    entities, response_data, tts_result = _turn('general')
+    assistant._cache_response(key, entities, response_data, 'reply', tts_result)
+    entities['symptoms'].append('changed by first caller')
+
+    hit_entities, hit_response, _, hit_tts = assistant._get_cached_response(key)
+    assert hit_entities['symptoms'] == ['chest']
+    hit_response['response_params']['symptoms'] = 'changed by second caller'
+    hit_tts['audio_data'] = None
+
+    again_entities, again_response, _, again_tts = assistant._get_cached_response(key)
+    assert again_response['response_params']['symptoms'] == 'chest'
+    assert again_tts['audio_data'] == b'ID3'
@@ -4,8 +4,8 @@ Supports Telugu, Hindi, and English voice input/output
 """
 
 from .speech_handler import SpeechHandler
-from .tts_handler import TTSHandler
+from .tts_handler import TTSHandler, get_tts_handler
 from .simple_ai_agent import SimpleAIAgent
 from .voice_assistant import VoiceAssistant
 
-__all__ = ['SpeechHandler', 'TTSHandler', 'SimpleAIAgent', 'VoiceAssistant']
+__all__ = ['SpeechHandler', 'TTSHandler', 'get_tts_handler', 'SimpleAIAgent', 'VoiceAssistant']
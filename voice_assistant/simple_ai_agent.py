@@ -7,25 +7,56 @@ import os
 import logging
 from typing import Dict, Any, Optional, List
 from datetime import datetime
+from functools import lru_cache
+import itertools
 import json
+from collections import deque
+import string
+import sys
+import threading
+import time
+from types import MappingProxyType
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class SimpleAIAgent:
-    def __init__(self):
-        """
-        Initialize Simple AI Agent for messages and calls
-        Designed for illiterate users with voice-based interactions
-        """
-        self.notifications = []
-        self.call_logs = []
-        
-        # Simple message templates in multiple languages
-        self.message_templates = {
-            'en': {
-                'heart_result': """
+_formatter = string.Formatter()
+
+
+def _compile_template(template: str) -> tuple:
+    """
+    Pre-split a str.format template into (literal, field, spec, conversion)
+    segments so rendering doesn't re-parse the template text each time
+    """
+    return tuple(_formatter.parse(template))
+
+
+def _render_template(segments: tuple, kwargs: Dict[str, Any]) -> str:
+    """
+    Render segments produced by _compile_template; equivalent to
+    template.format(**kwargs), raising KeyError for missing fields
+    """
+    parts = []
+    for literal, field, spec, conversion in segments:
+        parts.append(literal)
+        if field is not None:
+            value = kwargs[field]
+            if conversion:
+                value = _formatter.convert_field(value, conversion)
+            parts.append(format(value, spec) if spec else str(value))
+    return ''.join(parts)
+
+
+# Simple message templates in multiple languages
+_MESSAGE_TEMPLATES = {
+    'en': {
+        'heart_result': """
 🏥 *Medical Prediction Result*
 
 *Heart Health Analysis:*
@@ -46,8 +77,8 @@ class SimpleAIAgent:
 • Follow up in 3 months
 
 For emergency: Call 108 or visit nearest hospital
-                """,
-                'alzheimer_result': """
+        """,
+        'alzheimer_result': """
 🧠 *Medical Prediction Result*
 
 *Cognitive Health Analysis:*
@@ -69,8 +100,8 @@ For emergency: Call 108 or visit nearest hospital
 • Family support and monitoring
 
 For urgent concerns: Contact our emergency line
-                """,
-                'appointment_confirmed': """
+        """,
+        'appointment_confirmed': """
 📅 *Appointment Confirmed*
 
 *Appointment Details:*
@@ -90,8 +121,8 @@ For urgent concerns: Contact our emergency line
 *Address:* {clinic_address}
 
 We look forward to seeing you!
-                """,
-                'doctor_notification': """
+        """,
+        'doctor_notification': """
 🚨 *Patient Alert*
 
 *Patient Information:*
@@ -109,8 +140,8 @@ We look forward to seeing you!
 • Contact patient within 24 hours
 
 Patient is waiting for your response.
-                """,
-                'general_message': """
+        """,
+        'general_message': """
 🏥 *Medical Assistant Response*
 
 {message}
@@ -121,10 +152,10 @@ Patient is waiting for your response.
 • Emergency: Call 108
 
 Thank you for using our medical assistant!
-                """
-            },
-            'hi': {
-                'heart_result': """
+        """
+    },
+    'hi': {
+        'heart_result': """
 🏥 *चिकित्सा भविष्यवाणी परिणाम*
 
 *हृदय स्वास्थ्य विश्लेषण:*
@@ -145,8 +176,8 @@ Thank you for using our medical assistant!
 • 3 महीने में फॉलो-अप करें
 
 आपातकाल के लिए: 108 पर कॉल करें या निकटतम अस्पताल जाएं
-                """,
-                'alzheimer_result': """
+        """,
+        'alzheimer_result': """
 🧠 *चिकित्सा भविष्यवाणी परिणाम*
 
 *संज्ञानात्मक स्वास्थ्य विश्लेषण:*
@@ -168,8 +199,8 @@ Thank you for using our medical assistant!
 • पारिवारिक सहायता और निगरानी
 
 तत्काल चिंताओं के लिए: हमारी आपातकालीन लाइन से संपर्क करें
-                """,
-                'appointment_confirmed': """
+        """,
+        'appointment_confirmed': """
 📅 *अपॉइंटमेंट पुष्टि*
 
 *अपॉइंटमेंट विवरण:*
@@ -189,8 +220,8 @@ Thank you for using our medical assistant!
 *पता:* {clinic_address}
 
 हम आपसे मिलने की प्रतीक्षा कर रहे हैं!
-                """,
-                'doctor_notification': """
+        """,
+        'doctor_notification': """
 🚨 *रोगी अलर्ट*
 
 *रोगी जानकारी:*
@@ -208,8 +239,8 @@ Thank you for using our medical assistant!
 • 24 घंटे के भीतर रोगी से संपर्क करें
 
 रोगी आपकी प्रतिक्रिया की प्रतीक्षा कर रहा है।
-                """,
-                'general_message': """
+        """,
+        'general_message': """
 🏥 *चिकित्सा सहायक प्रतिक्रिया*
 
 {message}
@@ -220,10 +251,10 @@ Thank you for using our medical assistant!
 • आपातकाल: 108 पर कॉल करें
 
 हमारे चिकित्सा सहायक का उपयोग करने के लिए धन्यवाद!
-                """
-            },
-            'te': {
-                'heart_result': """
+        """
+    },
+    'te': {
+        'heart_result': """
 🏥 *వైద్య ఊహాఫలితం*
 
 *గుండె ఆరోగ్య విశ్లేషణ:*
@@ -244,8 +275,8 @@ Thank you for using our medical assistant!
 • 3 నెలలలో ఫాలో-అప్ చేయండి
 
 అత్యవసర పరిస్థితులకు: 108 కి కాల్ చేయండి లేదా దగ్గరి ఆసుపత్రికి వెళ్లండి
-                """,
-                'alzheimer_result': """
+        """,
+        'alzheimer_result': """
 🧠 *వైద్య ఊహాఫలితం*
 
 *అభిజ్ఞా ఆరోగ్య విశ్లేషణ:*
@@ -267,8 +298,8 @@ Thank you for using our medical assistant!
 • కుటుంబ మద్దతు మరియు పర్యవేక్షణ
 
 తక్షణ ఆందోళనలకు: మా అత్యవసర లైన్‌ను సంప్రదించండి
-                """,
-                'appointment_confirmed': """
+        """,
+        'appointment_confirmed': """
 📅 *అపాయింట్మెంట్ నిర్ధారణ*
 
 *అపాయింట్మెంట్ వివరాలు:*
@@ -288,8 +319,8 @@ Thank you for using our medical assistant!
 *చిరునామా:* {clinic_address}
 
 మేము మిమ్మల్ని చూడటానికి ఎదురుచూస్తున్నాము!
-                """,
-                'doctor_notification': """
+        """,
+        'doctor_notification': """
 🚨 *రోగి హెచ్చరిక*
 
 *రోగి సమాచారం:*
@@ -307,8 +338,8 @@ Thank you for using our medical assistant!
 • 24 గంటలలోపు రోగిని సంప్రదించండి
 
 రోగి మీ ప్రతిస్పందన కోసం వేచి ఉన్నారు।
-                """,
-                'general_message': """
+        """,
+        'general_message': """
 🏥 *వైద్య సహాయక ప్రతిస్పందన*
 
 {message}
@@ -319,33 +350,157 @@ Thank you for using our medical assistant!
 • అత్యవసర: 108 కి కాల్ చేయండి
 
 మా వైద్య సహాయకుని ఉపయోగించినందుకు ధన్యవాదాలు!
-                """
-            }
+        """
+    }
+}
+
+# Shared, read-only view of the templates: every agent instance references the
+# same strings instead of rebuilding the nested dict on construction
+MESSAGE_TEMPLATES = MappingProxyType({
+    sys.intern(language): MappingProxyType({
+        sys.intern(message_type): template for message_type, template in templates.items()
+    })
+    for language, templates in _MESSAGE_TEMPLATES.items()
+})
+
+# Known language codes mapped to their interned form, so tags stored with
+# every message share one object and compare by identity on lookup
+_LANGUAGE_TAGS = {
+    language: sys.intern(language)
+    for language in ('en', 'hi', 'te', 'ta', 'kn', 'ml', 'bn', 'gu', 'mr', 'pa')
+}
+
+
+def _intern_tag(tag: str) -> str:
+    """Interned copy of a language code / message type tag"""
+    if tag in _LANGUAGE_TAGS:
+        return _LANGUAGE_TAGS[tag]
+    return sys.intern(tag) if isinstance(tag, str) else tag
+
+
+# Templates parsed once; rendering joins the pre-split segments
+_COMPILED_TEMPLATES = {
+    (language, message_type): _compile_template(template)
+    for language, templates in MESSAGE_TEMPLATES.items()
+    for message_type, template in templates.items()
+}
+
+
+# Upper bound on in-memory notifications / call logs per agent
+MAX_LOG_ENTRIES = 10_000
+# How often (seconds) buffered records are written to the log file
+FLUSH_INTERVAL = 0.05
+
+
+def _tail(entries: deque, limit: int) -> List[Dict[str, Any]]:
+    """Last `limit` entries of a log, oldest first"""
+    if limit <= 0:
+        return []
+    return list(itertools.islice(entries, max(0, len(entries) - limit), None))
+
+
+# Notifications are stored column-wise (one bounded deque per field) rather
+# than as one dict per message; 'type' and 'status' are the same for every
+# sent message so they are not stored at all
+NOTIFICATION_COLUMNS = ('id', 'message_type', 'language', 'timestamp', 'content')
+
+
+def _json_line(record: Dict[str, Any]) -> bytes:
+    """One UTF-8 JSON-lines record; orjson when installed, stdlib json otherwise"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+@lru_cache(maxsize=1)
+def _second_stamps(second: int) -> tuple:
+    """Local-time id prefix and UTC ISO base for one wall-clock second"""
+    return (
+        datetime.fromtimestamp(second).strftime('%Y%m%d%H%M%S'),
+        datetime.utcfromtimestamp(second).isoformat(),
+    )
+
+
+def _stamp() -> tuple:
+    """
+    (id prefix, UTC ISO timestamp) for now; the datetime formatting runs at
+    most once per second, only the microsecond suffix is built per call
+    """
+    now_ns = time.time_ns()
+    second, ns = divmod(now_ns, 1_000_000_000)
+    prefix, iso = _second_stamps(second)
+    return prefix, f"{iso}.{ns // 1000:06d}"
+
+
+@lru_cache(maxsize=512)
+def _render_cached(language: str, message_type: str, items: tuple) -> str:
+    """Repeated sends with identical parameters reuse the rendered text"""
+    return _render_template(
+        _COMPILED_TEMPLATES[(language, message_type)],
+        {k: v for k, _, v in items}
+    )
+
+
+class SimpleAIAgent:
+    def __init__(self, log_path: Optional[str] = None):
+        """
+        Initialize Simple AI Agent for messages and calls
+        Designed for illiterate users with voice-based interactions
+        
+        If `log_path` (or AI_AGENT_LOG_PATH) is set, notifications and call
+        logs are also appended there as JSON lines, written in batches by a
+        background thread
+        """
+        # Only the most recent entries are kept in memory
+        self._notification_columns = {
+            column: deque(maxlen=MAX_LOG_ENTRIES) for column in NOTIFICATION_COLUMNS
         }
+        self.call_logs = deque(maxlen=MAX_LOG_ENTRIES)
+        # Lifetime totals; also the per-agent sequence numbers that keep ids
+        # unique within the same second
+        self.messages_sent = 0
+        self.calls_made = 0
+        # Sends may come from several threads; a row's columns, its sequence
+        # number and the call log are only touched under this lock
+        self._log_lock = threading.Lock()
+        
+        # Optional persistence, batched off the send path
+        self.log_path = log_path or os.getenv('AI_AGENT_LOG_PATH')
+        self._pending = deque()
+        self._stop_flusher = threading.Event()
+        self._flusher = None
+        if self.log_path:
+            self._flusher = threading.Thread(target=self._flush_loop, name='ai-agent-log-flusher', daemon=True)
+            self._flusher.start()
+        self.message_templates = MESSAGE_TEMPLATES
     
     def send_message(self, message_type: str, language: str = 'en', **kwargs) -> Dict[str, Any]:
         """
         Send a message (simulated - stores in local notifications)
         """
         try:
+            message_type, language = _intern_tag(message_type), _intern_tag(language)
             message_text = self._get_message_template(message_type, language, **kwargs)
+            id_prefix, timestamp = _stamp()
             
-            notification = {
-                'id': f"msg_{datetime.now().strftime('%Y%m%d%H%M%S')}",
-                'type': 'message',
-                'message_type': message_type,
-                'language': language,
-                'content': message_text,
-                'timestamp': datetime.utcnow().isoformat(),
-                'status': 'sent'
-            }
-            
-            self.notifications.append(notification)
+            columns = self._notification_columns
+            with self._log_lock:
+                self.messages_sent += 1
+                message_id = f"msg_{id_prefix}_{self.messages_sent:x}"
+                columns['id'].append(message_id)
+                columns['message_type'].append(message_type)
+                columns['language'].append(language)
+                columns['timestamp'].append(timestamp)
+                columns['content'].append(message_text)
+            if self.log_path:
+                self._persist(self._notification_row(
+                    message_id, message_type, language, timestamp, message_text
+                ))
             logger.info(f"Message sent: {message_type} in {language}")
             
             return {
                 'success': True,
-                'message_id': notification['id'],
+                'message_id': message_id,
                 'message_type': message_type,
                 'language': language,
                 'content': message_text
@@ -363,21 +518,25 @@ Thank you for using our medical assistant!
         Simulate a call (stores in call logs)
         """
         try:
+            message_type, language = _intern_tag(message_type), _intern_tag(language)
             message_text = self._get_message_template(message_type, language, **kwargs)
+            id_prefix, timestamp = _stamp()
             
-            call_log = {
-                'id': f"call_{datetime.now().strftime('%Y%m%d%H%M%S')}",
-                'type': 'call',
-                'phone_number': phone_number,
-                'message_type': message_type,
-                'language': language,
-                'content': message_text,
-                'timestamp': datetime.utcnow().isoformat(),
-                'status': 'completed',
-                'duration': '2-3 minutes (simulated)'
-            }
-            
-            self.call_logs.append(call_log)
+            with self._log_lock:
+                self.calls_made += 1
+                call_log = {
+                    'id': f"call_{id_prefix}_{self.calls_made:x}",
+                    'type': 'call',
+                    'phone_number': phone_number,
+                    'message_type': message_type,
+                    'language': language,
+                    'content': message_text,
+                    'timestamp': timestamp,
+                    'status': 'completed',
+                    'duration': '2-3 minutes (simulated)'
+                }
+                self.call_logs.append(call_log)
+            self._persist(call_log)
             logger.info(f"Call made to {phone_number}: {message_type} in {language}")
             
             return {
@@ -428,32 +587,68 @@ Thank you for using our medical assistant!
         
         return self.send_message('appointment_confirmed', language, **kwargs)
     
-    def notify_doctor(self, patient_data: Dict[str, Any], request_type: str, language: str = 'en') -> Dict[str, Any]:
+    def notify_doctor(self, patient_data: Dict[str, Any], request_type: str, language: str = 'en',
+                      symptoms_text: Optional[str] = None) -> Dict[str, Any]:
         """
         Notify doctor about patient request
+        
+        Callers alerting several doctors about the same patient can pass the
+        joined symptom list as `symptoms_text` instead of having it rebuilt
+        for every alert
         """
+        if symptoms_text is None:
+            symptoms_text = ', '.join(patient_data.get('symptoms', ()))
         kwargs = {
             'patient_name': patient_data.get('name', 'Unknown'),
             'patient_age': patient_data.get('age', 'Unknown'),
             'patient_contact': patient_data.get('contact', 'Not provided'),
-            'symptoms': ', '.join(patient_data.get('symptoms', [])),
+            'symptoms': symptoms_text,
             'request_type': request_type,
             'priority': 'High' if 'emergency' in request_type.lower() else 'Normal'
         }
         
         return self.send_message('doctor_notification', language, **kwargs)
     
-    def get_notifications(self, limit: int = 50) -> List[Dict[str, Any]]:
+    def get_notifications(self, limit: int = 50, message_type: Optional[str] = None,
+                          language: Optional[str] = None) -> List[Dict[str, Any]]:
         """
-        Get recent notifications
+        Get recent notifications, optionally only those of one message type
+        and/or language
         """
-        return self.notifications[-limit:] if self.notifications else []
+        if limit <= 0:
+            return []
+        columns = [self._notification_columns[column] for column in NOTIFICATION_COLUMNS]
+        with self._log_lock:
+            if message_type is None and language is None:
+                start = max(0, len(columns[0]) - limit)
+                rows = list(zip(*(itertools.islice(column, start, None) for column in columns)))
+            else:
+                # One pass over the rows, keeping the last `limit` matches
+                rows = deque((
+                    row for row in zip(*columns)
+                    if (message_type is None or row[1] == message_type) and (language is None or row[2] == language)
+                ), maxlen=limit)
+        return [self._notification_row(*row) for row in rows]
+    
+    @staticmethod
+    def _notification_row(message_id: str, message_type: str, language: str,
+                          timestamp: str, content: str) -> Dict[str, Any]:
+        return {
+            'id': message_id,
+            'type': 'message',
+            'message_type': message_type,
+            'language': language,
+            'content': content,
+            'timestamp': timestamp,
+            'status': 'sent'
+        }
     
     def get_call_logs(self, limit: int = 50) -> List[Dict[str, Any]]:
         """
         Get recent call logs
         """
-        return self.call_logs[-limit:] if self.call_logs else []
+        with self._log_lock:
+            return _tail(self.call_logs, limit)
     
     def _get_message_template(self, message_type: str, language: str, **kwargs) -> str:
         """
@@ -466,27 +661,78 @@ Thank you for using our medical assistant!
         
         if message_type in templates:
             try:
-                return templates[message_type].format(**kwargs)
+                return self._render(language, message_type, kwargs)
             except KeyError as e:
                 logger.warning(f"Missing template parameter: {e}")
                 return templates[message_type]
         else:
             # Fallback to general message
-            return templates['general_message'].format(
-                message=f"Message type '{message_type}' not found. Data: {kwargs}",
-                helpline_number='+91-XXXX-XXXXXX',
-                website_url='https://yourclinic.com'
-            )
+            return _render_template(_COMPILED_TEMPLATES[(language, 'general_message')], {
+                'message': f"Message type '{message_type}' not found. Data: {kwargs}",
+                'helpline_number': '+91-XXXX-XXXXXX',
+                'website_url': 'https://yourclinic.com'
+            })
+    
+    def _render(self, language: str, message_type: str, kwargs: Dict[str, Any]) -> str:
+        """
+        Render a template through the LRU cache; the key carries each value's
+        type so e.g. 1 and 1.0 (equal hashes, different text) don't collide
+        """
+        try:
+            items = tuple(sorted((k, type(v), v) for k, v in kwargs.items()))
+            hash(items)
+        except TypeError:
+            # Unhashable parameter values can't be cached
+            return _render_template(_COMPILED_TEMPLATES[(language, message_type)], kwargs)
+        return _render_cached(language, message_type, items)
+    
+    def _persist(self, record: Dict[str, Any]) -> None:
+        if self.log_path:
+            self._pending.append(record)
+    
+    def _flush_loop(self) -> None:
+        while not self._stop_flusher.wait(FLUSH_INTERVAL):
+            self.flush()
+    
+    def flush(self) -> None:
+        """
+        Write all pending records to the log file in a single write
+        """
+        batch = []
+        while self._pending:
+            batch.append(self._pending.popleft())
+        if not batch:
+            return
+        try:
+            with open(self.log_path, 'ab') as f:
+                f.write(b''.join(_json_line(record) for record in batch))
+        except Exception as e:
+            logger.error(f"Error persisting agent logs: {e}")
+    
+    def close(self) -> None:
+        """
+        Stop the background flusher and write out anything still pending
+        """
+        self._stop_flusher.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        if self.log_path:
+            self.flush()
     
     def get_status(self) -> Dict[str, Any]:
         """
         Get agent status and statistics
         """
+        timestamps = self._notification_columns['timestamp']
+        with self._log_lock:
+            messages_sent, calls_made = self.messages_sent, self.calls_made
+            last_activity = timestamps[-1] if timestamps else None
         return {
             'agent_type': 'Simple AI Agent',
-            'notifications_sent': len(self.notifications),
-            'calls_made': len(self.call_logs),
+            'notifications_sent': messages_sent,
+            'calls_made': calls_made,
             'supported_languages': list(self.message_templates.keys()),
-            'last_activity': self.notifications[-1]['timestamp'] if self.notifications else None,
+            'last_activity': last_activity,
             'status': 'active'
         }
@@ -4,11 +4,18 @@ Handles multilingual speech-to-text conversion using Google Speech Recognition A
 Supports Telugu, Hindi, and English with auto-detection
 """
 
+import asyncio
+import hashlib
 import io
 import os
 import re
+import struct
+import threading
 import speech_recognition as sr
-from langdetect import detect, LangDetectException
+from langdetect import detect, DetectorFactory, LangDetectException
+from langdetect.detector_factory import init_factory
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Optional, Dict, Any
 import logging
 try:
@@ -17,11 +24,158 @@ try:
 except ImportError:
     PYDUB_AVAILABLE = False
     logging.warning("pydub not available, audio format conversion limited")
+try:
+    import soundfile
+    SOUNDFILE_AVAILABLE = True
+except (ImportError, OSError):
+    SOUNDFILE_AVAILABLE = False
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Common medical terms in different languages (for better recognition).
+# Immutable and shared by all handlers; scanned in list order.
+MEDICAL_KEYWORDS = {
+    'en': ('heart', 'chest', 'pain', 'memory', 'forget', 'doctor', 'hospital', 'medicine', 'symptoms'),
+    'hi': ('दिल', 'सीने', 'दर्द', 'याददाश्त', 'भूल', 'डॉक्टर', 'अस्पताल', 'दवा', 'लक्षण'),
+    'te': ('గుండె', 'ఛాతీ', 'నొప్పి', 'గుర్తుంచుకోవడం', 'మరచిపోవడం', 'డాక్టర్', 'ఆసుపత్రి', 'మందులు', 'లక్షణాలు')
+}
+
+
+# Name / age extraction patterns, compiled once and tried in order
+NAME_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r"name\s*(?:is|:)?\s*([A-Za-z\u0900-\u097F\u0C00-\u0C7F]{2,30}(?:\s[A-Za-z\u0900-\u097F\u0C00-\u0C7F]{2,30})?)",
+    r"i am\s+([A-Za-z\u0900-\u097F\u0C00-\u0C7F]{2,30}(?:\s[A-Za-z\u0900-\u097F\u0C00-\u0C7F]{2,30})?)",
+    r"this is\s+([A-Za-z\u0900-\u097F\u0C00-\u0C7F]{2,30}(?:\s[A-Za-z\u0900-\u097F\u0C00-\u0C7F]{2,30})?)",
+    r"my name\s+(?:is\s+)?([A-Za-z\u0900-\u097F\u0C00-\u0C7F]{2,30}(?:\s[A-Za-z\u0900-\u097F\u0C00-\u0C7F]{2,30})?)"
+))
+
+# Literal text every name pattern requires; checked before running them so
+# most utterances are walked once instead of once per pattern
+NAME_ANCHORS = ('name', 'i am', 'this is')
+
+_DIGIT = re.compile(r"\d")
+
+AGE_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r"(\d{1,3})\s*years?\s*old",
+    r"age\s*(?:is\s*)?(\d{1,3})",
+    r"(\d{1,3})\s*yrs?",
+    r"i am\s+(\d{1,3})\s*years?",
+    r"(\d{1,3})\s*సంవత్సరాలు",  # Telugu
+    r"(\d{1,3})\s*साल",  # Hindi
+))
+
+
+# Entity extraction is deterministic in (text, language); results for this
+# many recent utterances are memoized per handler
+ENTITY_CACHE_SIZE = 1024
+
+# Successful transcriptions of recently seen clips (retries, replayed test
+# traffic), keyed by a hash of the audio bytes and the language hint
+TRANSCRIPTION_CACHE_SIZE = 256
+
+# Container magic numbers, checked before falling back to pydub/ffmpeg
+RIFF_MAGIC = b'RIFF'
+OGG_MAGIC = b'OggS'
+WAVE_FORMAT_PCM = 1
+
+
+def _is_pcm_wav(audio_file: bytes) -> bool:
+    """
+    Whether `audio_file` is a plain PCM WAV, which the recognizer reads
+    directly (any rate / channel count) without an ffmpeg round trip
+    """
+    if len(audio_file) < 36 or audio_file[:4] != RIFF_MAGIC or audio_file[8:16] != b'WAVEfmt ':
+        return False
+    return struct.unpack_from('<H', audio_file, 20)[0] == WAVE_FORMAT_PCM
+
+
+def _decode_ogg(audio_file: bytes) -> Optional[sr.AudioData]:
+    """Decode an Ogg (Vorbis/Opus) upload in-process with libsndfile"""
+    try:
+        samples, sample_rate = soundfile.read(io.BytesIO(audio_file), dtype='int16')
+    except Exception as e:
+        logger.warning(f"soundfile could not decode Ogg audio: {e}")
+        return None
+    if samples.ndim > 1:
+        # Down-mix to mono
+        samples = samples.mean(axis=1).astype('int16')
+    return sr.AudioData(samples.tobytes(), sample_rate, 2)
+
+
+# langdetect is only deterministic with a fixed seed, which also makes its
+# results safe to memoize
+DetectorFactory.seed = 0
+
+
+_warmup_started = threading.Event()
+_profiles_loaded = threading.Event()
+
+
+def _warm_up_language_detection() -> None:
+    """Load langdetect's language profiles ahead of the first request"""
+    try:
+        init_factory()
+    except Exception as e:
+        logger.warning(f"Language detection warm-up failed: {e}")
+    finally:
+        _profiles_loaded.set()
+
+
+@lru_cache(maxsize=1024)
+def _detect_cached(text: str) -> str:
+    # langdetect publishes its factory before the profiles finish loading
+    if _warmup_started.is_set():
+        _profiles_loaded.wait()
+    return detect(text)
+
+
+def _scan_keywords(text: str, keywords: tuple) -> list:
+    """
+    Keywords (in table order) that occur in `text`. For vocabularies this
+    small, per-keyword C substring search beats a combined regex or
+    automaton pass, so that is what the scan uses.
+    """
+    return [keyword for keyword in keywords if keyword in text]
+
+
+# Intent keywords in different languages; intents are checked in this order
+INTENT_KEYWORDS = {
+    'heart': {
+        'en': ('heart', 'chest', 'cardiac', 'chest pain', 'heart attack'),
+        'hi': ('दिल', 'सीने', 'हृदय', 'सीने में दर्द'),
+        'te': ('గుండె', 'ఛాతీ', 'హృదయ', 'ఛాతీలో నొప్పి')
+    },
+    'alzheimer': {
+        'en': ('memory', 'forget', 'alzheimer', 'dementia', 'remember'),
+        'hi': ('याददाश्त', 'भूल', 'अल्जाइमर', 'भूलने की बीमारी'),
+        'te': ('గుర్తుంచుకోవడం', 'మరచిపోవడం', 'అల్జైమర్', 'మతిభ్రమణ')
+    },
+    'appointment': {
+        'en': ('appointment', 'book', 'schedule', 'visit', 'meet doctor'),
+        'hi': ('अपॉइंटमेंट', 'बुक', 'मिलना', 'डॉक्टर से मिलना'),
+        'te': ('అపాయింట్మెంట్', 'బుక్', 'కలవడం', 'డాక్టర్‌ను కలవడం')
+    },
+    'contact': {
+        'en': ('contact', 'call', 'phone', 'emergency', 'help'),
+        'hi': ('संपर्क', 'कॉल', 'फोन', 'आपातकाल', 'मदद'),
+        'te': ('సంపర్కం', 'కాల్', 'ఫోన్', 'అత్యవసర', 'సహాయం')
+    }
+}
+
+def _flatten_intent_keywords(intent_keywords: dict) -> dict:
+    """Per language, every (keyword, intent) pair in priority order"""
+    pairs = {}
+    for intent_type, keywords in intent_keywords.items():
+        for language, words in keywords.items():
+            pairs.setdefault(language, []).extend((word, intent_type) for word in words)
+    return {language: tuple(language_pairs) for language, language_pairs in pairs.items()}
+
+
+INTENT_KEYWORD_SCAN = _flatten_intent_keywords(INTENT_KEYWORDS)
+
+
 class SpeechHandler:
     def __init__(self):
         self.recognizer = sr.Recognizer()
@@ -43,12 +197,16 @@ class SpeechHandler:
             'pa': 'pa-IN'
         }
         
-        # Common medical terms in different languages (for better recognition)
-        self.medical_keywords = {
-            'en': ['heart', 'chest', 'pain', 'memory', 'forget', 'doctor', 'hospital', 'medicine', 'symptoms'],
-            'hi': ['दिल', 'सीने', 'दर्द', 'याददाश्त', 'भूल', 'डॉक्टर', 'अस्पताल', 'दवा', 'लक्षण'],
-            'te': ['గుండె', 'ఛాతీ', 'నొప్పి', 'గుర్తుంచుకోవడం', 'మరచిపోవడం', 'డాక్టర్', 'ఆసుపత్రి', 'మందులు', 'లక్షణాలు']
-        }
+        self.medical_keywords = MEDICAL_KEYWORDS
+        self._extract_entities_cached = lru_cache(maxsize=ENTITY_CACHE_SIZE)(self._extract_entities)
+        self._transcriptions = OrderedDict()
+        self._transcriptions_lock = threading.Lock()
+        
+        # langdetect loads its profiles lazily on the first detect() call;
+        # do that in the background so the first transcription isn't delayed
+        if not _warmup_started.is_set():
+            _warmup_started.set()
+            threading.Thread(target=_warm_up_language_detection, name='langdetect-warmup', daemon=True).start()
     
     def detect_language(self, text: str) -> str:
         """
@@ -56,7 +214,7 @@ class SpeechHandler:
         Returns language code (en, hi, te, etc.)
         """
         try:
-            detected_lang = detect(text)
+            detected_lang = _detect_cached(text.strip())
             logger.info(f"Detected language: {detected_lang}")
             return detected_lang
         except LangDetectException:
@@ -68,48 +226,67 @@ class SpeechHandler:
         Convert audio to text using Google Speech Recognition
         Returns dict with transcription, detected language, and confidence
         """
+        key = hashlib.blake2b(audio_file, digest_size=16).digest() + (language_hint or '').encode()
+        with self._transcriptions_lock:
+            cached = self._transcriptions.get(key)
+            if cached is not None:
+                self._transcriptions.move_to_end(key)
+                return dict(cached)
+        
+        result = self._transcribe(audio_file, language_hint)
+        if result['success']:
+            with self._transcriptions_lock:
+                self._transcriptions[key] = result
+                if len(self._transcriptions) > TRANSCRIPTION_CACHE_SIZE:
+                    self._transcriptions.popitem(last=False)
+            return dict(result)
+        return result
+    
+    def _transcribe(self, audio_file: bytes, language_hint: Optional[str]) -> Dict[str, Any]:
         try:
-            # Convert bytes to AudioFile
+            # Original audio as a file-like object
             audio_io = io.BytesIO(audio_file)
+            audio = None
             
-            # Try to convert audio to WAV format if pydub is available
-            converted_audio = audio_file
-            if PYDUB_AVAILABLE:
+            # Dispatch on the container: PCM WAV is read by the recognizer as-is,
+            # Ogg is decoded in-process when soundfile is installed, and anything
+            # else is converted to WAV by pydub (ffmpeg) if available. The
+            # converted buffer is handed to the recognizer as-is (no copies)
+            if audio_file[:4] == OGG_MAGIC and SOUNDFILE_AVAILABLE:
+                audio = _decode_ogg(audio_file)
+            if audio is None and PYDUB_AVAILABLE and not _is_pcm_wav(audio_file):
                 try:
                     # Try to convert the audio to WAV format
-                    audio = AudioSegment.from_file(audio_io)
+                    segment = AudioSegment.from_file(io.BytesIO(audio_file))
                     wav_buffer = io.BytesIO()
-                    audio.export(wav_buffer, format="wav", parameters=["-ar", "16000"])
+                    segment.export(wav_buffer, format="wav", parameters=["-ar", "16000"])
                     wav_buffer.seek(0)
-                    converted_audio = wav_buffer.read()
+                    audio_io = wav_buffer
                     logger.info("Audio converted to WAV format using pydub")
                 except Exception as conversion_error:
                     logger.warning(f"Audio conversion failed: {conversion_error}")
                     # Fall back to original audio
-                    converted_audio = audio_file
-            
-            # Convert bytes to AudioFile for speech recognition
-            audio_io = io.BytesIO(converted_audio)
             
-            try:
-                with sr.AudioFile(audio_io) as source:
-                    # Adjust for ambient noise
-                    self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                    audio = self.recognizer.record(source)
-            except Exception as audio_error:
-                logger.warning(f"Could not read audio file directly: {audio_error}")
-                # Try using AudioData instead
+            if audio is None:
                 try:
-                    audio = sr.AudioData(converted_audio, 16000, 2)
-                except Exception as e:
-                    logger.error(f"Could not create AudioData: {e}")
-                    return {
-                        'text': '',
-                        'language': 'en',
-                        'confidence': 0.0,
-                        'success': False,
-                        'error': f'Audio format not supported: {str(e)}'
-                    }
+                    with sr.AudioFile(audio_io) as source:
+                        # No ambient-noise calibration: on a file it would just eat the
+                        # first half second of the clip
+                        audio = self.recognizer.record(source)
+                except Exception as audio_error:
+                    logger.warning(f"Could not read audio file directly: {audio_error}")
+                    # Try using AudioData instead
+                    try:
+                        audio = sr.AudioData(audio_io.getvalue(), 16000, 2)
+                    except Exception as e:
+                        logger.error(f"Could not create AudioData: {e}")
+                        return {
+                            'text': '',
+                            'language': 'en',
+                            'confidence': 0.0,
+                            'success': False,
+                            'error': f'Audio format not supported: {str(e)}'
+                        }
             
             # Try with language hint first if provided
             if language_hint and language_hint in self.language_codes:
@@ -182,53 +359,53 @@ class SpeechHandler:
                 'error': f'Unexpected error: {str(e)}'
             }
     
+    async def transcribe_audio_async(self, audio_file: bytes, language_hint: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Asynchronous wrapper around `transcribe_audio` so concurrent voice
+        requests don't block the event loop on the recognizer's HTTP call
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None,
+            self.transcribe_audio,
+            audio_file,
+            language_hint,
+        )
+    
     def extract_medical_entities(self, text: str, language: str) -> Dict[str, Any]:
         """
         Extract medical entities from transcribed text
         Returns name, age, symptoms, and intent
         """
+        entities = self._extract_entities_cached(text, language)
+        # Callers may modify the result; keep the memoized copy intact
+        return {**entities, 'symptoms': list(entities['symptoms'])}
+    
+    def _extract_entities(self, text: str, language: str) -> Dict[str, Any]:
         text_lower = text.lower()
         
-        # Name extraction patterns
-        name_patterns = [
-            r"name\s*(?:is|:)?\s*([A-Za-z\u0900-\u097F\u0C00-\u0C7F]{2,30}(?:\s[A-Za-z\u0900-\u097F\u0C00-\u0C7F]{2,30})?)",
-            r"i am\s+([A-Za-z\u0900-\u097F\u0C00-\u0C7F]{2,30}(?:\s[A-Za-z\u0900-\u097F\u0C00-\u0C7F]{2,30})?)",
-            r"this is\s+([A-Za-z\u0900-\u097F\u0C00-\u0C7F]{2,30}(?:\s[A-Za-z\u0900-\u097F\u0C00-\u0C7F]{2,30})?)",
-            r"my name\s+(?:is\s+)?([A-Za-z\u0900-\u097F\u0C00-\u0C7F]{2,30}(?:\s[A-Za-z\u0900-\u097F\u0C00-\u0C7F]{2,30})?)"
-        ]
-        
-        # Age extraction patterns
-        age_patterns = [
-            r"(\d{1,3})\s*years?\s*old",
-            r"age\s*(?:is\s*)?(\d{1,3})",
-            r"(\d{1,3})\s*yrs?",
-            r"i am\s+(\d{1,3})\s*years?",
-            r"(\d{1,3})\s*సంవత్సరాలు",  # Telugu
-            r"(\d{1,3})\s*साल",  # Hindi
-        ]
-        
-        # Extract name
+        # Extract name (only worth trying when one of the patterns' anchors is present)
         name = None
-        for pattern in name_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                name = match.group(1).strip()
-                break
+        if any(anchor in text_lower for anchor in NAME_ANCHORS):
+            for pattern in NAME_PATTERNS:
+                match = pattern.search(text)
+                if match:
+                    name = match.group(1).strip()
+                    break
         
-        # Extract age
+        # Extract age (every pattern needs a digit)
         age = None
-        for pattern in age_patterns:
-            match = re.search(pattern, text_lower)
-            if match:
-                age = int(match.group(1))
-                break
+        if _DIGIT.search(text_lower):
+            for pattern in AGE_PATTERNS:
+                match = pattern.search(text_lower)
+                if match:
+                    age = int(match.group(1))
+                    break
         
         # Extract symptoms based on language
         symptoms = []
         if language in self.medical_keywords:
-            for keyword in self.medical_keywords[language]:
-                if keyword in text_lower:
-                    symptoms.append(keyword)
+            symptoms = _scan_keywords(text_lower, self.medical_keywords[language])
         
         # Intent detection
         intent = self._detect_intent(text_lower, language)
@@ -245,34 +422,8 @@ class SpeechHandler:
         """
         Detect user intent from the transcribed text
         """
-        # Intent keywords in different languages
-        intent_keywords = {
-            'heart': {
-                'en': ['heart', 'chest', 'cardiac', 'chest pain', 'heart attack'],
-                'hi': ['दिल', 'सीने', 'हृदय', 'सीने में दर्द'],
-                'te': ['గుండె', 'ఛాతీ', 'హృదయ', 'ఛాతీలో నొప్పి']
-            },
-            'alzheimer': {
-                'en': ['memory', 'forget', 'alzheimer', 'dementia', 'remember'],
-                'hi': ['याददाश्त', 'भूल', 'अल्जाइमर', 'भूलने की बीमारी'],
-                'te': ['గుర్తుంచుకోవడం', 'మరచిపోవడం', 'అల్జైమర్', 'మతిభ్రమణ']
-            },
-            'appointment': {
-                'en': ['appointment', 'book', 'schedule', 'visit', 'meet doctor'],
-                'hi': ['अपॉइंटमेंट', 'बुक', 'मिलना', 'डॉक्टर से मिलना'],
-                'te': ['అపాయింట్మెంట్', 'బుక్', 'కలవడం', 'డాక్టర్‌ను కలవడం']
-            },
-            'contact': {
-                'en': ['contact', 'call', 'phone', 'emergency', 'help'],
-                'hi': ['संपर्क', 'कॉल', 'फोन', 'आपातकाल', 'मदद'],
-                'te': ['సంపర్కం', 'కాల్', 'ఫోన్', 'అత్యవసర', 'సహాయం']
-            }
-        }
-        
-        for intent_type, keywords in intent_keywords.items():
-            if language in keywords:
-                for keyword in keywords[language]:
-                    if keyword in text:
-                        return intent_type
+        for keyword, intent_type in INTENT_KEYWORD_SCAN.get(language, ()):
+            if keyword in text:
+                return intent_type
         
         return 'general'
@@ -4,20 +4,202 @@ Handles multilingual text-to-speech conversion using gTTS and pyttsx3
 Supports Telugu, Hindi, and English with natural voice synthesis
 """
 
+import asyncio
 import io
 import os
 import tempfile
-from typing import Dict, Any, Optional
+import hashlib
+import queue
+import re
+import shutil
+import string
+import subprocess
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
 import logging
 from gtts import gTTS
 import pyttsx3
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Number of synthesized clips kept in memory per handler
+AUDIO_CACHE_SIZE = 256
+
+# Concurrent synthesis requests per handler (batch / async callers)
+TTS_WORKERS = 8
+
+# Offline clips are written to tmpfs when available so they never hit disk
+OFFLINE_TMP_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# Medical response templates in different languages
+_TEMPLATES_BY_LANGUAGE = {
+    'en': {
+        'heart_result': "Based on your symptoms, I've analyzed your heart health. The prediction shows {prediction} with {risk_percentage}% risk level. Please consult a doctor for detailed examination.",
+        'alzheimer_result': "I've analyzed your cognitive health. The prediction indicates {prediction} with {risk_percentage}% risk level. Please schedule a consultation with a neurologist.",
+        'appointment_confirmed': "Your appointment has been scheduled. You will receive confirmation details via WhatsApp shortly.",
+        'contact_doctor': "I'll notify the doctor about your request. Please provide your contact number if you haven't already.",
+        'general_response': "I understand you mentioned {symptoms}. Please provide more details about your symptoms for better assistance.",
+        'error_response': "I'm sorry, I couldn't understand your request clearly. Please try speaking again or contact our support team."
+    },
+    'hi': {
+        'heart_result': "आपके लक्षणों के आधार पर, मैंने आपके हृदय स्वास्थ्य का विश्लेषण किया है। भविष्यवाणी {prediction} दिखाती है जिसमें {risk_percentage}% जोखिम स्तर है। विस्तृत जांच के लिए कृपया डॉक्टर से सलाह लें।",
+        'alzheimer_result': "मैंने आपके संज्ञानात्मक स्वास्थ्य का विश्लेषण किया है। भविष्यवाणी {prediction} दिखाती है जिसमें {risk_percentage}% जोखिम स्तर है। कृपया न्यूरोलॉजिस्ट के साथ परामर्श का समय निर्धारित करें।",
+        'appointment_confirmed': "आपका अपॉइंटमेंट निर्धारित हो गया है। आपको जल्द ही व्हाट्सऐप के माध्यम से पुष्टि विवरण प्राप्त होगा।",
+        'contact_doctor': "मैं आपके अनुरोध के बारे में डॉक्टर को सूचित करूंगा। यदि आपने पहले से नहीं दिया है तो कृपया अपना संपर्क नंबर प्रदान करें।",
+        'general_response': "मैं समझ गया कि आपने {symptoms} का उल्लेख किया है। बेहतर सहायता के लिए कृपया अपने लक्षणों के बारे में अधिक विवरण प्रदान करें।",
+        'error_response': "मुझे खेद है, मैं आपके अनुरोध को स्पष्ट रूप से समझ नहीं सका। कृपया फिर से बोलने का प्रयास करें या हमारी सहायता टीम से संपर्क करें।"
+    },
+    'te': {
+        'heart_result': "మీ లక్షణాల ఆధారంగా, నేను మీ గుండె ఆరోగ్యాన్ని విశ్లేషించాను. అంచనా {prediction} చూపిస్తుంది {risk_percentage}% ప్రమాద స్థాయితో. వివరణాత్మక పరీక్ష కోసం దయచేసి వైద్యుడిని సంప్రదించండి.",
+        'alzheimer_result': "నేను మీ అభిజ్ఞా ఆరోగ్యాన్ని విశ్లేషించాను. అంచనా {prediction} చూపిస్తుంది {risk_percentage}% ప్రమాద స్థాయితో. దయచేసి న్యూరాలజిస్ట్‌తో సంప్రదింపు షెడ్యూల్ చేయండి.",
+        'appointment_confirmed': "మీ అపాయింట్మెంట్ షెడ్యూల్ చేయబడింది. మీరు త్వరలో వాట్సాప్ ద్వారా నిర్ధారణ వివరాలను అందుకుంటారు.",
+        'contact_doctor': "నేను మీ అభ్యర్థన గురించి వైద్యుడికి తెలియజేస్తాను. మీరు ఇంతకు ముందు ఇవ్వకపోతే దయచేసి మీ కాంటాక్ట్ నంబర్‌ను అందించండి.",
+        'general_response': "మీరు {symptoms} గురించి ప్రస్తావించారని నేను అర్థం చేసుకున్నాను. మెరుగైన సహాయం కోసం దయచేసి మీ లక్షణాల గురించి మరింత వివరాలను అందించండి.",
+        'error_response': "క్షమించండి, నేను మీ అభ్యర్థనను స్పష్టంగా అర్థం చేసుకోలేకపోయాను. దయచేసి మళ్లీ మాట్లాడడానికి ప్రయత్నించండి లేదా మా మద్దతు బృందాన్ని సంప్రదించండి."
+    }
+}
+
+# Flat (language, template key) -> text, built once at import and shared by
+# every handler (and, under a pre-forking server, every worker)
+RESPONSE_TEMPLATES = {
+    (language, template_key): template
+    for language, templates in _TEMPLATES_BY_LANGUAGE.items()
+    for template_key, template in templates.items()
+}
+RESPONSE_LANGUAGES = frozenset(_TEMPLATES_BY_LANGUAGE)
+
+# Response template used for each intent; anything else gets 'error_response'
+INTENT_TEMPLATES = {
+    'heart': 'heart_result',
+    'alzheimer': 'alzheimer_result',
+    'appointment': 'appointment_confirmed',
+    'contact': 'contact_doctor',
+    'general': 'general_response'
+}
+
+
+
+class _IntentRenderers(dict):
+    """
+    intent -> bound template renderer for one language; unknown intents get
+    the error response (like a defaultdict, but without inserting the key)
+    """
+    
+    def __init__(self, renderers: Dict[str, Any], error_renderer):
+        super().__init__(renderers)
+        self.error_renderer = error_renderer
+    
+    def __missing__(self, intent: str):
+        return self.error_renderer
+
+
+# language -> intent -> bound renderer, so a response is a single lookup with
+# no fallback branches
+RESPONSE_RENDERERS = {
+    language: _IntentRenderers(
+        {
+            intent: RESPONSE_TEMPLATES[(language, template_key)].format_map
+            for intent, template_key in INTENT_TEMPLATES.items()
+            if (language, template_key) in RESPONSE_TEMPLATES
+        },
+        RESPONSE_TEMPLATES[(language, 'error_response')].format_map
+    )
+    for language in RESPONSE_LANGUAGES
+}
+
+# WhatsApp-style voice notes: Ogg/Opus at 16 kbit/s, encoded by ffmpeg
+FFMPEG_PATH = shutil.which('ffmpeg')
+OPUS_BITRATE = '16k'
+
+# Sentence boundaries (including the Devanagari danda) for streamed synthesis
+SENTENCE_BREAK = re.compile(r'(?<=[.!?\u0964])\s+')
+# How many of one stream's sentences may occupy the shared synthesis pool
+# at a time, so a long reply can't starve other callers
+STREAM_MAX_INFLIGHT = 2
+
+# pyttsx3 clips are RIFF/WAV; gTTS clips are MP3
+RIFF_MAGIC = b'RIFF'
+
+# Control characters gTTS would otherwise read out or choke on, stripped from
+# template parameters in one C-level pass
+PARAM_SANITIZE_TABLE = str.maketrans({'\n': ' ', '\r': ' ', '\t': ' ', '\x00': None})
+
+
+def _encode_opus(audio_data: bytes) -> Optional[bytes]:
+    """
+    Transcode a clip (gTTS MP3 or pyttsx3 WAV) to Ogg/Opus through an ffmpeg
+    pipe; None if ffmpeg is missing or fails
+    """
+    if not FFMPEG_PATH:
+        return None
+    try:
+        completed = subprocess.run(
+            [FFMPEG_PATH, '-loglevel', 'error', '-i', 'pipe:0',
+             '-ac', '1', '-c:a', 'libopus', '-b:a', OPUS_BITRATE, '-f', 'ogg', 'pipe:1'],
+            input=audio_data, capture_output=True, check=True, timeout=30
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning("Opus encoding failed: %s", e)
+        return None
+    return completed.stdout
+
+
+def _is_mp3(result: Dict[str, Any]) -> bool:
+    """Whether a synthesis result holds gTTS MP3 audio rather than a pyttsx3 WAV"""
+    return result['success'] and result['audio_data'][:4] != RIFF_MAGIC
+
+
+def _is_static_template(template: str) -> bool:
+    """Whether a response template has no placeholders (always the same text)"""
+    return all(field is None for _, field, _, _ in string.Formatter().parse(template))
+
+
 class TTSHandler:
-    def __init__(self):
+    """
+    Multilingual response generation and speech synthesis. Each instance
+    starts its own pyttsx3 engine and thread pool; use `get_tts_handler()`
+    to share one process-wide instead of constructing it per request
+    """
+    
+    __slots__ = (
+        '_audio_cache', '_static_audio', '_cache_max', '_cache_lock', 'cache_dir',
+        '_inflight', '_inflight_lock',
+        '_pool', 'language_codes', '_known_langs',
+        '_tts_queue', '_tts_thread', 'engine', '_voices', '_voice_properties', '_voice_by_lang',
+        'offline_available'
+    )
+    
+    def __init__(self, cache_dir: Optional[str] = None, prewarm_static: bool = True):
+        """
+        Synthesized audio is cached in memory (LRU) keyed on text, language
+        and method; if `cache_dir` (or TTS_CACHE_DIR) is set, clips are also
+        kept there so a restart doesn't start cold
+        
+        With `prewarm_static`, responses without placeholders are synthesized
+        in the background at startup and kept for the life of the handler
+        """
+        self._audio_cache = OrderedDict()
+        # Pinned audio for the placeholder-free responses; never evicted
+        self._static_audio = {}
+        self._cache_max = AUDIO_CACHE_SIZE
+        self._cache_lock = threading.Lock()
+        # cache key -> Future of the synthesis currently running for it
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self.cache_dir = cache_dir or os.getenv('TTS_CACHE_DIR')
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        
+        # Network-bound gTTS calls for batch / async callers run here
+        self._pool = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix='tts')
+        
         # Language mapping for gTTS
         self.language_codes = {
             'en': 'en',
@@ -31,93 +213,233 @@ class TTSHandler:
             'mr': 'mr',
             'pa': 'pa'
         }
+        # The mapping is the identity, so normalizing is just a membership test
+        self._known_langs = frozenset(self.language_codes)
         
-        # Initialize pyttsx3 for offline TTS
+        # Initialize pyttsx3 for offline TTS. pyttsx3 isn't reentrant, so the
+        # engine is created on and only driven from one worker thread; request
+        # threads just enqueue jobs and wait for their result
+        self._tts_queue = queue.Queue()
+        engine_ready = Future()
+        self._tts_thread = threading.Thread(
+            target=self._tts_worker, args=(engine_ready,), name='pyttsx3-worker', daemon=True
+        )
+        self._tts_thread.start()
         try:
-            self.engine = pyttsx3.init()
-            self.engine.setProperty('rate', 150)  # Speed of speech
-            self.engine.setProperty('volume', 0.9)  # Volume level (0.0 to 1.0)
+            self.engine, self._voices, self._voice_properties = engine_ready.result()
+            self._voice_by_lang = {
+                'hi': self._voices[1].id if len(self._voices) > 1 else None,  # Usually female voice
+                'te': self._voices[2].id if len(self._voices) > 2 else None  # Try different voice
+            }
             self.offline_available = True
             logger.info("Offline TTS engine initialized successfully")
         except Exception as e:
-            logger.warning(f"Offline TTS not available: {e}")
+            logger.warning("Offline TTS not available: %s", e)
             self.offline_available = False
         
-        # Medical response templates in different languages
-        self.response_templates = {
-            'en': {
-                'heart_result': "Based on your symptoms, I've analyzed your heart health. The prediction shows {prediction} with {risk_percentage}% risk level. Please consult a doctor for detailed examination.",
-                'alzheimer_result': "I've analyzed your cognitive health. The prediction indicates {prediction} with {risk_percentage}% risk level. Please schedule a consultation with a neurologist.",
-                'appointment_confirmed': "Your appointment has been scheduled. You will receive confirmation details via WhatsApp shortly.",
-                'contact_doctor': "I'll notify the doctor about your request. Please provide your contact number if you haven't already.",
-                'general_response': "I understand you mentioned {symptoms}. Please provide more details about your symptoms for better assistance.",
-                'error_response': "I'm sorry, I couldn't understand your request clearly. Please try speaking again or contact our support team."
-            },
-            'hi': {
-                'heart_result': "आपके लक्षणों के आधार पर, मैंने आपके हृदय स्वास्थ्य का विश्लेषण किया है। भविष्यवाणी {prediction} दिखाती है जिसमें {risk_percentage}% जोखिम स्तर है। विस्तृत जांच के लिए कृपया डॉक्टर से सलाह लें।",
-                'alzheimer_result': "मैंने आपके संज्ञानात्मक स्वास्थ्य का विश्लेषण किया है। भविष्यवाणी {prediction} दिखाती है जिसमें {risk_percentage}% जोखिम स्तर है। कृपया न्यूरोलॉजिस्ट के साथ परामर्श का समय निर्धारित करें।",
-                'appointment_confirmed': "आपका अपॉइंटमेंट निर्धारित हो गया है। आपको जल्द ही व्हाट्सऐप के माध्यम से पुष्टि विवरण प्राप्त होगा।",
-                'contact_doctor': "मैं आपके अनुरोध के बारे में डॉक्टर को सूचित करूंगा। यदि आपने पहले से नहीं दिया है तो कृपया अपना संपर्क नंबर प्रदान करें।",
-                'general_response': "मैं समझ गया कि आपने {symptoms} का उल्लेख किया है। बेहतर सहायता के लिए कृपया अपने लक्षणों के बारे में अधिक विवरण प्रदान करें।",
-                'error_response': "मुझे खेद है, मैं आपके अनुरोध को स्पष्ट रूप से समझ नहीं सका। कृपया फिर से बोलने का प्रयास करें या हमारी सहायता टीम से संपर्क करें।"
-            },
-            'te': {
-                'heart_result': "మీ లక్షణాల ఆధారంగా, నేను మీ గుండె ఆరోగ్యాన్ని విశ్లేషించాను. అంచనా {prediction} చూపిస్తుంది {risk_percentage}% ప్రమాద స్థాయితో. వివరణాత్మక పరీక్ష కోసం దయచేసి వైద్యుడిని సంప్రదించండి.",
-                'alzheimer_result': "నేను మీ అభిజ్ఞా ఆరోగ్యాన్ని విశ్లేషించాను. అంచనా {prediction} చూపిస్తుంది {risk_percentage}% ప్రమాద స్థాయితో. దయచేసి న్యూరాలజిస్ట్‌తో సంప్రదింపు షెడ్యూల్ చేయండి.",
-                'appointment_confirmed': "మీ అపాయింట్మెంట్ షెడ్యూల్ చేయబడింది. మీరు త్వరలో వాట్సాప్ ద్వారా నిర్ధారణ వివరాలను అందుకుంటారు.",
-                'contact_doctor': "నేను మీ అభ్యర్థన గురించి వైద్యుడికి తెలియజేస్తాను. మీరు ఇంతకు ముందు ఇవ్వకపోతే దయచేసి మీ కాంటాక్ట్ నంబర్‌ను అందించండి.",
-                'general_response': "మీరు {symptoms} గురించి ప్రస్తావించారని నేను అర్థం చేసుకున్నాను. మెరుగైన సహాయం కోసం దయచేసి మీ లక్షణాల గురించి మరింత వివరాలను అందించండి.",
-                'error_response': "క్షమించండి, నేను మీ అభ్యర్థనను స్పష్టంగా అర్థం చేసుకోలేకపోయాను. దయచేసి మళ్లీ మాట్లాడడానికి ప్రయత్నించండి లేదా మా మద్దతు బృందాన్ని సంప్రదించండి."
-            }
-        }
+        if prewarm_static:
+            self._pool.submit(self._prewarm_static_responses)
     
     def generate_response(self, intent: str, language: str, **kwargs) -> str:
         """
         Generate appropriate response text based on intent and language
         """
-        if language not in self.response_templates:
-            language = 'en'  # Fallback to English
-        
-        templates = self.response_templates[language]
-        
-        if intent == 'heart' and 'heart_result' in templates:
-            return templates['heart_result'].format(**kwargs)
-        elif intent == 'alzheimer' and 'alzheimer_result' in templates:
-            return templates['alzheimer_result'].format(**kwargs)
-        elif intent == 'appointment' and 'appointment_confirmed' in templates:
-            return templates['appointment_confirmed']
-        elif intent == 'contact' and 'contact_doctor' in templates:
-            return templates['contact_doctor']
-        elif intent == 'general' and 'general_response' in templates:
-            return templates['general_response'].format(**kwargs)
-        else:
-            return templates['error_response']
+        # Unknown languages fall back to English
+        renderers = RESPONSE_RENDERERS.get(language) or RESPONSE_RENDERERS['en']
+        return renderers[intent]({
+            key: value.translate(PARAM_SANITIZE_TABLE) if isinstance(value, str) else value
+            for key, value in kwargs.items()
+        })
     
-    def text_to_speech(self, text: str, language: str, use_offline: bool = False) -> Dict[str, Any]:
+    def text_to_speech(self, text: str, language: str, use_offline: bool = False,
+                       audio_format: Optional[str] = None) -> Dict[str, Any]:
         """
         Convert text to speech using gTTS or pyttsx3
         Returns audio data as bytes
+        
+        `audio_format='opus'` returns a 16 kbit/s Ogg/Opus clip (for voice-note
+        delivery) instead of the engine's MP3/WAV, when ffmpeg is available
         """
         try:
-            if use_offline and self.offline_available:
-                return self._offline_tts(text, language)
-            else:
-                return self._online_tts(text, language)
+            key = self._cache_key(text, language, use_offline, audio_format)
+            audio_data = self._cache_get(key)
+            if audio_data is not None:
+                return self._cached_result(audio_data, language, audio_format)
+            
+            # Identical requests already being synthesized share that one
+            # upstream call instead of issuing their own
+            with self._inflight_lock:
+                pending = self._inflight.get(key)
+                owner = pending is None
+                if owner:
+                    pending = self._inflight[key] = Future()
+            if not owner:
+                return dict(pending.result())
+            
+            try:
+                result = self._synthesize(key, text, language, use_offline, audio_format)
+                pending.set_result(result)
+            except Exception as e:
+                pending.set_exception(e)
+                raise
+            finally:
+                with self._inflight_lock:
+                    del self._inflight[key]
+            return dict(result)
         except Exception as e:
-            logger.error(f"TTS error: {e}")
+            logger.error("TTS error: %s", e)
             return {
                 'audio_data': None,
                 'success': False,
                 'error': str(e)
             }
     
+    @staticmethod
+    def _cached_result(audio_data: bytes, language: str, audio_format: Optional[str]) -> Dict[str, Any]:
+        result = {
+            'audio_data': audio_data,
+            'success': True,
+            'method': 'cache',
+            'language': language
+        }
+        if audio_format == 'opus':
+            result['format'] = 'opus'
+        return result
+    
+    def _synthesize(self, key: str, text: str, language: str, use_offline: bool,
+                    audio_format: Optional[str]) -> Dict[str, Any]:
+        """
+        Run the TTS engine for a cache miss (and optionally transcode), then
+        cache a successful clip under `key`
+        """
+        # A request that just finished may have filled the cache since our miss
+        audio_data = self._cache_get(key)
+        if audio_data is not None:
+            return self._cached_result(audio_data, language, audio_format)
+        
+        if use_offline and self.offline_available:
+            engine = 'pyttsx3'
+            result = self._offline_tts(text, language)
+        else:
+            engine = 'gTTS'
+            result = self._online_tts(text, language)
+        
+        if result['success'] and audio_format == 'opus':
+            opus_data = _encode_opus(result['audio_data'])
+            if opus_data is None:
+                # Don't cache the native clip under the Opus key
+                return result
+            result['audio_data'] = opus_data
+            result['format'] = 'opus'
+        
+        # A pyttsx3 fallback clip (gTTS briefly failing) must not be cached
+        # under the gTTS key, or the phrase would keep being served as WAV
+        if result['success'] and result['method'] == engine:
+            self._cache_put(key, result['audio_data'])
+        return result
+    
+    def text_to_speech_batch(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Synthesize several texts concurrently; each item has 'text',
+        'language' and optionally 'use_offline' / 'audio_format'. Results
+        keep item order
+        """
+        return list(self._pool.map(
+            lambda item: self.text_to_speech(
+                item['text'], item['language'], item.get('use_offline', False), item.get('audio_format')
+            ),
+            items
+        ))
+    
+    async def text_to_speech_async(self, text: str, language: str, use_offline: bool = False,
+                                   audio_format: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Asynchronous wrapper around `text_to_speech` that keeps the event
+        loop free during the gTTS round trip
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._pool,
+            self.text_to_speech,
+            text,
+            language,
+            use_offline,
+            audio_format,
+        )
+    
+    def _prewarm_static_responses(self) -> None:
+        """
+        Synthesize every placeholder-free response template (appointment
+        confirmation, contact doctor, error) once, so those replies never
+        wait on gTTS
+        """
+        for (language, _), template in RESPONSE_TEMPLATES.items():
+            if not _is_static_template(template):
+                continue
+            result = self._online_tts(template, language)
+            # A pyttsx3 fallback clip must not be pinned under the gTTS key
+            if result['success'] and result['method'] == 'gTTS':
+                self._static_audio[self._cache_key(template, language, False)] = result['audio_data']
+        logger.info("Pre-rendered %s static TTS responses", len(self._static_audio))
+    
+    @staticmethod
+    def _cache_key(text: str, language: str, use_offline: bool, audio_format: Optional[str] = None) -> str:
+        """128-bit hex fingerprint of a request (also the on-disk file name)"""
+        key = f"{text}|{language}|{use_offline}"
+        if audio_format:
+            key = f"{key}|{audio_format}"
+        if XXHASH_AVAILABLE:
+            return xxhash.xxh3_128_hexdigest(key)
+        return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+    
+    def _cache_get(self, key: str) -> Optional[bytes]:
+        audio_data = self._static_audio.get(key)
+        if audio_data is not None:
+            return audio_data
+        
+        with self._cache_lock:
+            audio_data = self._audio_cache.get(key)
+            if audio_data is not None:
+                self._audio_cache.move_to_end(key)
+                return audio_data
+        
+        if self.cache_dir:
+            path = os.path.join(self.cache_dir, key)
+            if os.path.exists(path):
+                try:
+                    with open(path, 'rb') as f:
+                        audio_data = f.read()
+                except OSError as e:
+                    logger.warning("Could not read cached TTS audio: %s", e)
+                    return None
+                self._cache_put(key, audio_data, persist=False)
+                return audio_data
+        return None
+    
+    def _cache_put(self, key: str, audio_data: bytes, persist: bool = True) -> None:
+        with self._cache_lock:
+            self._audio_cache[key] = audio_data
+            self._audio_cache.move_to_end(key)
+            while len(self._audio_cache) > self._cache_max:
+                self._audio_cache.popitem(last=False)
+        
+        if persist and self.cache_dir:
+            path = os.path.join(self.cache_dir, key)
+            try:
+                # Write-then-rename so readers never see a partial clip
+                with open(f"{path}.tmp", 'wb') as f:
+                    f.write(audio_data)
+                os.replace(f"{path}.tmp", path)
+            except OSError as e:
+                logger.warning("Could not persist TTS audio: %s", e)
+    
     def _online_tts(self, text: str, language: str) -> Dict[str, Any]:
         """
         Use gTTS for online text-to-speech
         """
         try:
             # Map language code for gTTS
-            tts_language = self.language_codes.get(language, 'en')
+            tts_language = language if language in self._known_langs else 'en'
             
             # Create gTTS object
             tts = gTTS(text=text, lang=tts_language, slow=False)
@@ -125,19 +447,19 @@ class TTSHandler:
             # Generate audio data
             audio_buffer = io.BytesIO()
             tts.write_to_fp(audio_buffer)
-            audio_buffer.seek(0)
+            audio_data = audio_buffer.getvalue()
             
-            logger.info(f"Generated TTS audio for language: {language}")
+            logger.info("Generated TTS audio for language: %s", language)
             
             return {
-                'audio_data': audio_buffer.getvalue(),
+                'audio_data': audio_data,
                 'success': True,
                 'method': 'gTTS',
                 'language': language
             }
             
         except Exception as e:
-            logger.error(f"gTTS error: {e}")
+            logger.error("gTTS error: %s", e)
             # Fallback to offline TTS if available
             if self.offline_available:
                 return self._offline_tts(text, language)
@@ -148,36 +470,138 @@ class TTSHandler:
                     'error': str(e)
                 }
     
+    async def text_to_speech_stream(self, text: str, language: str) -> Tuple[Optional[str], Optional[AsyncIterator[bytes]]]:
+        """
+        (media type, chunk iterator) for streaming `text` as speech, or
+        (None, None) if it cannot be synthesized
+        
+        Normally the text is spoken sentence by sentence as gTTS MP3, with
+        at most STREAM_MAX_INFLIGHT sentences on the pool at once, so
+        playback starts after the first sentence. If gTTS can't produce the
+        first sentence, the whole text is synthesized offline as a single WAV
+        instead; the two formats are never mixed in one stream. If gTTS fails
+        after streaming has started, the iterator raises rather than ending
+        quietly, so the client sees an aborted response, not a short clip
+        """
+        loop = asyncio.get_running_loop()
+        sentences = deque(sentence for sentence in SENTENCE_BREAK.split(text.strip()) if sentence)
+        if not sentences:
+            return None, None
+        jobs = deque()
+        
+        def submit() -> None:
+            while sentences and len(jobs) < STREAM_MAX_INFLIGHT:
+                jobs.append(loop.run_in_executor(self._pool, self._gtts_sentence, sentences.popleft(), language))
+        
+        submit()
+        first = await jobs.popleft()
+        if not _is_mp3(first):
+            for job in jobs:
+                job.cancel()
+            if not self.offline_available:
+                return None, None
+            result = await self.text_to_speech_async(text, language, use_offline=True)
+            if not result['success']:
+                return None, None
+            
+            async def offline_clip() -> AsyncIterator[bytes]:
+                yield result['audio_data']
+            return 'audio/wav', offline_clip()
+        
+        async def mp3_chunks() -> AsyncIterator[bytes]:
+            try:
+                yield first['audio_data']
+                submit()
+                while jobs:
+                    result = await jobs.popleft()
+                    if not _is_mp3(result):
+                        # Already committed to MP3: fail the response rather
+                        # than end it early as if complete
+                        error = result.get('error', 'no gTTS audio')
+                        logger.error("Streamed TTS aborted: %s", error)
+                        raise RuntimeError(f"Streamed TTS aborted: {error}")
+                    submit()
+                    yield result['audio_data']
+            finally:
+                for job in jobs:
+                    job.cancel()
+        return 'audio/mpeg', mp3_chunks()
+    
+    def _gtts_sentence(self, text: str, language: str) -> Dict[str, Any]:
+        """
+        `text_to_speech` for one streamed sentence; a cached clip that isn't
+        MP3 (a WAV cached during an earlier gTTS outage) is re-synthesized
+        with gTTS and replaced in the cache
+        """
+        result = self.text_to_speech(text, language)
+        if result.get('method') != 'cache' or _is_mp3(result):
+            return result
+        fresh = self._online_tts(text, language)
+        if fresh['success'] and fresh['method'] == 'gTTS':
+            self._cache_put(self._cache_key(text, language, False), fresh['audio_data'])
+        return fresh
+    
+    def _tts_worker(self, engine_ready: Future) -> None:
+        """
+        Owns the pyttsx3 engine: initializes it, then runs queued
+        (text, path, voice id, future) synthesis jobs one at a time
+        """
+        try:
+            engine = pyttsx3.init()
+            engine.setProperty('rate', 150)  # Speed of speech
+            engine.setProperty('volume', 0.9)  # Volume level (0.0 to 1.0)
+            # Installed voices don't change while the process runs; enumerate them once
+            voices = engine.getProperty('voices') or []
+            # Rate and volume are never changed after this, so callers can
+            # report them without touching the engine
+            properties = {'rate': engine.getProperty('rate'), 'volume': engine.getProperty('volume')}
+        except Exception as e:
+            engine_ready.set_exception(e)
+            return
+        engine_ready.set_result((engine, voices, properties))
+        
+        # Switching voices makes some drivers (SAPI5) reload the voice, so
+        # only do it when a job actually needs a different one
+        current_voice = None
+        while True:
+            text, path, voice_id, future = self._tts_queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if voice_id and voice_id != current_voice:
+                    engine.setProperty('voice', voice_id)
+                    current_voice = voice_id
+                engine.save_to_file(text, path)
+                engine.runAndWait()
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(path)
+    
     def _offline_tts(self, text: str, language: str) -> Dict[str, Any]:
         """
         Use pyttsx3 for offline text-to-speech
         """
         try:
             # Save to temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_file:
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav', dir=OFFLINE_TMP_DIR) as temp_file:
                 temp_path = temp_file.name
             
-            # Configure voice based on language (limited support)
-            voices = self.engine.getProperty('voices')
-            if voices:
-                # Try to find appropriate voice for language
-                if language == 'hi' and len(voices) > 1:
-                    self.engine.setProperty('voice', voices[1].id)  # Usually female voice
-                elif language == 'te' and len(voices) > 2:
-                    self.engine.setProperty('voice', voices[2].id)  # Try different voice
-            
-            # Generate speech and save to file
-            self.engine.save_to_file(text, temp_path)
-            self.engine.runAndWait()
-            
-            # Read the generated audio file
-            with open(temp_path, 'rb') as audio_file:
-                audio_data = audio_file.read()
+            try:
+                # Generate speech and save to file on the engine's thread,
+                # with a voice based on language (limited support)
+                job = Future()
+                self._tts_queue.put((text, temp_path, self._voice_by_lang.get(language), job))
+                job.result()
+                
+                # Read the generated audio file
+                with open(temp_path, 'rb') as audio_file:
+                    audio_data = audio_file.read()
+            finally:
+                # Clean up temporary file, even if synthesis failed
+                os.unlink(temp_path)
             
-            # Clean up temporary file
-            os.unlink(temp_path)
-            
-            logger.info(f"Generated offline TTS audio for language: {language}")
+            logger.info("Generated offline TTS audio for language: %s", language)
             
             return {
                 'audio_data': audio_data,
@@ -187,7 +611,7 @@ class TTSHandler:
             }
             
         except Exception as e:
-            logger.error(f"Offline TTS error: {e}")
+            logger.error("Offline TTS error: %s", e)
             return {
                 'audio_data': None,
                 'success': False,
@@ -202,10 +626,9 @@ class TTSHandler:
             return {'offline_available': False}
         
         try:
-            voices = self.engine.getProperty('voices')
             voice_info = []
             
-            for i, voice in enumerate(voices):
+            for voice in self._voices:
                 voice_info.append({
                     'id': voice.id,
                     'name': voice.name,
@@ -217,13 +640,27 @@ class TTSHandler:
             return {
                 'offline_available': True,
                 'voices': voice_info,
-                'current_rate': self.engine.getProperty('rate'),
-                'current_volume': self.engine.getProperty('volume')
+                'current_rate': self._voice_properties['rate'],
+                'current_volume': self._voice_properties['volume']
             }
             
         except Exception as e:
-            logger.error(f"Error getting voice info: {e}")
+            logger.error("Error getting voice info: %s", e)
             return {
                 'offline_available': True,
                 'error': str(e)
             }
+
+
+_tts_handler = None
+_tts_handler_lock = threading.Lock()
+
+
+def get_tts_handler() -> TTSHandler:
+    """Process-wide TTSHandler, created on first use"""
+    global _tts_handler
+    if _tts_handler is None:
+        with _tts_handler_lock:
+            if _tts_handler is None:
+                _tts_handler = TTSHandler()
+    return _tts_handler
@@ -4,21 +4,154 @@ Integrates speech recognition, TTS, and WhatsApp services
 Provides a unified interface for multilingual medical voice assistance
 """
 
+import asyncio
+import copy
+import hashlib
 import os
 import logging
+import queue
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import OrderedDict
 from typing import Dict, Any, Optional, List
-from datetime import datetime
+from datetime import datetime, timezone
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 from .speech_handler import SpeechHandler
-from .tts_handler import TTSHandler
+from .tts_handler import get_tts_handler
 from .simple_ai_agent import SimpleAIAgent
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_UTC = timezone.utc
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# AI agent notifications are sent by a background worker, off the request
+# path; it drains up to NOTIFICATION_BATCH_SIZE queued turns at a time
+NOTIFICATION_QUEUE_SIZE = 1000
+NOTIFICATION_BATCH_SIZE = 16
+
+# Recently answered utterances are replayed from memory for this long
+RESPONSE_CACHE_TTL = 300  # seconds
+RESPONSE_CACHE_MAX_ENTRIES = 512
+# Intents with side effects are always re-run: booking and doctor alerts,
+# and predictions, which the backend records against the calling user
+UNCACHEABLE_INTENTS = frozenset({'heart', 'alzheimer', 'appointment', 'contact'})
+
+# Symptom keywords -> feature overrides, applied in order (later rules win).
+# Keywords are matched as substrings of the joined, lowercased symptom list
+HEART_SYMPTOM_RULES = (
+    (('chest', 'pain'), {'cp': 2}),  # Typical angina
+    (('pressure', 'high'), {'trestbps': 140}),
+    (('cholesterol', 'fat'), {'chol': 250}),
+    (('diabetes', 'sugar'), {'fbs': 1}),
+    (('exercise', 'angina'), {'exang': 1}),
+)
+
+ALZHEIMER_SYMPTOM_RULES = (
+    (('memory', 'forget'), {'mmse': 22}),  # Lower MMSE score
+    (('severe', 'advanced'), {'mmse': 15, 'nwbv': 0.7}),
+    (('mild',), {'mmse': 25, 'nwbv': 0.75}),
+)
+
+
+# (connect, read) timeouts per backend endpoint, so a hung backend costs a
+# voice turn seconds rather than a worker for half a minute
+API_TIMEOUTS = {
+    'heart_prediction': (2.0, 8.0),
+    'alzheimer_prediction': (2.0, 8.0),
+    'book_appointment': (2.0, 3.0),
+    'contact_doctor': (2.0, 3.0)
+}
+
+# Optional backend routes (booking, doctor contact) also fail fast: after
+# BREAKER_FAIL_MAX consecutive failures the route is skipped for
+# BREAKER_RESET_TIMEOUT seconds in favour of the local simulator
+BREAKER_FAIL_MAX = 3
+BREAKER_RESET_TIMEOUT = 60  # seconds
+
+
+class _CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker. While open, allow_request() is
+    False; once reset_timeout has passed a single trial call is let through,
+    and its outcome closes or re-opens the breaker
+    """
+    
+    __slots__ = ('fail_max', 'reset_timeout', '_failures', '_opened_at', '_lock')
+    
+    def __init__(self, fail_max: int = BREAKER_FAIL_MAX, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+    
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            # Half-open: let this caller probe, keep the rest short-circuited
+            self._opened_at = time.monotonic()
+            return True
+    
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+    
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.fail_max:
+                self._opened_at = time.monotonic()
+
+
+def _response_json(response: requests.Response) -> Any:
+    """Decode a backend JSON response; orjson when installed, requests' json otherwise"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+def _symptoms_joined(entities: Dict[str, Any]) -> str:
+    """The symptoms as a ', '-joined string, computed once per turn and kept on the entities"""
+    joined = entities.get('_symptoms_joined')
+    if joined is None:
+        joined = entities['_symptoms_joined'] = ', '.join(entities.get('symptoms', ()))
+    return joined
+
+
+def _apply_symptom_rules(features: Dict[str, Any], symptoms: List[str], rules: tuple) -> Dict[str, Any]:
+    """Apply feature overrides for every rule whose keywords appear in the symptoms"""
+    symptoms_text = ' '.join(symptoms).lower()
+    for keywords, overrides in rules:
+        if any(keyword in symptoms_text for keyword in keywords):
+            features.update(overrides)
+    return features
+
+
 class VoiceAssistant:
+    __slots__ = (
+        'base_url', 'speech_handler', 'tts_handler', 'ai_agent',
+        '_response_cache', '_response_cache_lock', '_http',
+        'api_endpoints', 'api_timeouts', '_timeout_counts', '_timeout_counts_lock', '_breakers',
+        '_intent_handlers', '_notification_queue', '_notification_worker', '_static_status'
+    )
+    
     def __init__(self, base_url: str = "http://localhost:8000"):
         """
         Initialize the Voice Assistant with all required components
@@ -27,9 +160,25 @@ class VoiceAssistant:
         
         # Initialize components
         self.speech_handler = SpeechHandler()
-        self.tts_handler = TTSHandler()
+        self.tts_handler = get_tts_handler()
         self.ai_agent = SimpleAIAgent()
         
+        # utterance key -> (expires_at, entities, response_data, response_text, tts_result)
+        self._response_cache = OrderedDict()
+        self._response_cache_lock = threading.Lock()
+        
+        # One pooled HTTP session for all backend calls, so connections (and
+        # TLS handshakes) are reused across voice turns. Only failed connects
+        # are retried: POSTs are not replayed once sent
+        adapter = HTTPAdapter(
+            pool_connections=20,
+            pool_maxsize=50,
+            max_retries=Retry(total=2, backoff_factor=0.1, status_forcelist=[502, 503, 504])
+        )
+        self._http = requests.Session()
+        self._http.mount('http://', adapter)
+        self._http.mount('https://', adapter)
+        
         # API endpoints for existing backend routes
         self.api_endpoints = {
             'heart_prediction': f"{self.base_url}/predict/heart",
@@ -37,6 +186,43 @@ class VoiceAssistant:
             'book_appointment': f"{self.base_url}/appointments/book",  # Assuming this exists
             'contact_doctor': f"{self.base_url}/doctors/contact"  # Assuming this exists
         }
+        self.api_timeouts = dict(API_TIMEOUTS)
+        # endpoint -> number of calls that timed out
+        self._timeout_counts = dict.fromkeys(self.api_endpoints, 0)
+        self._timeout_counts_lock = threading.Lock()
+        self._breakers = {
+            'book_appointment': _CircuitBreaker(),
+            'contact_doctor': _CircuitBreaker()
+        }
+        
+        # Intent -> backend handler; anything else is a general query
+        self._intent_handlers = {
+            'heart': self._handle_heart_prediction,
+            'alzheimer': self._handle_alzheimer_prediction,
+            'appointment': self._handle_appointment_booking,
+            'contact': self._handle_doctor_contact
+        }
+        
+        self._notification_queue = queue.Queue(maxsize=NOTIFICATION_QUEUE_SIZE)
+        self._notification_worker = threading.Thread(
+            target=self._run_notification_worker, name='voice-notifications', daemon=True
+        )
+        self._notification_worker.start()
+        
+        # Component capabilities and endpoints are fixed after start-up, so
+        # the status payload is built once; only the AI agent part is live
+        self._static_status = {
+            'speech_recognition': {
+                'available': True,
+                'supported_languages': list(self.speech_handler.language_codes)
+            },
+            'text_to_speech': {
+                'available': True,
+                'supported_languages': list(self.tts_handler.language_codes),
+                'offline_available': self.tts_handler.offline_available
+            },
+            'backend_endpoints': dict(self.api_endpoints)
+        }
         
         logger.info("Voice Assistant initialized successfully")
     
@@ -45,10 +231,11 @@ class VoiceAssistant:
         """
         Main method to process voice input and generate response
         """
+        speech_handler, tts_handler = self.speech_handler, self.tts_handler
         try:
             # Step 1: Convert speech to text
             logger.info("Processing voice input...")
-            transcription_result = self.speech_handler.transcribe_audio(audio_data, language_hint)
+            transcription_result = speech_handler.transcribe_audio(audio_data, language_hint)
             
             if not transcription_result['success']:
                 return self._create_error_response(
@@ -63,12 +250,94 @@ class VoiceAssistant:
             logger.info(f"Transcribed text: {text}")
             logger.info(f"Detected language: {detected_language}")
             
+            cache_key = self._response_cache_key(text, detected_language)
+            cached = self._get_cached_response(cache_key)
+            if cached is not None:
+                # Steps 2-5 already done for this utterance
+                entities, response_data, response_text, tts_result = cached
+            else:
+                # Step 2: Extract medical entities and intent
+                entities = speech_handler.extract_medical_entities(text, detected_language)
+                logger.info(f"Extracted entities: {entities}")
+                
+                # Step 3: Process intent and call appropriate backend services
+                response_data = self._process_intent(entities, detected_language)
+                
+                # Step 4: Generate response text
+                response_text = tts_handler.generate_response(
+                    entities['intent'], 
+                    detected_language, 
+                    **response_data.get('response_params', {})
+                )
+                
+                # Step 5: Convert response to speech
+                tts_result = tts_handler.text_to_speech(response_text, detected_language)
+                self._cache_response(cache_key, entities, response_data, response_text, tts_result)
+            
+            # Step 6: Send AI agent notification if requested
+            ai_result = None
+            if user_whatsapp:
+                ai_result = self._queue_ai_notification(
+                    user_whatsapp, entities, response_data, detected_language
+                )
+            
+            return self._create_voice_response(
+                transcription_result, entities, response_text, tts_result, response_data, ai_result
+            )
+            
+        except Exception as e:
+            logger.error(f"Error processing voice input: {e}")
+            return self._create_error_response(
+                "Processing failed", 
+                str(e), 
+                language_hint or 'en'
+            )
+    
+    async def process_voice_input_async(self, audio_data: bytes, user_whatsapp: Optional[str] = None,
+                                        language_hint: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Same pipeline as `process_voice_input` for async callers: blocking
+        recognition, backend calls and speech synthesis run off the event loop
+        """
+        try:
+            # Step 1: Convert speech to text
+            logger.info("Processing voice input...")
+            transcription_result = await self.speech_handler.transcribe_audio_async(audio_data, language_hint)
+            
+            if not transcription_result['success']:
+                return await asyncio.to_thread(
+                    self._create_error_response,
+                    "Speech recognition failed",
+                    transcription_result.get('error', 'Unknown error'),
+                    language_hint or 'en'
+                )
+            
+            text = transcription_result['text']
+            detected_language = transcription_result['language']
+            
+            logger.info(f"Transcribed text: {text}")
+            logger.info(f"Detected language: {detected_language}")
+            
+            cache_key = self._response_cache_key(text, detected_language)
+            cached = self._get_cached_response(cache_key)
+            if cached is not None:
+                # Steps 2-5 already done for this utterance
+                entities, response_data, response_text, tts_result = cached
+                ai_result = None
+                if user_whatsapp:
+                    ai_result = self._queue_ai_notification(
+                        user_whatsapp, entities, response_data, detected_language
+                    )
+                return self._create_voice_response(
+                    transcription_result, entities, response_text, tts_result, response_data, ai_result
+                )
+            
             # Step 2: Extract medical entities and intent
             entities = self.speech_handler.extract_medical_entities(text, detected_language)
             logger.info(f"Extracted entities: {entities}")
             
             # Step 3: Process intent and call appropriate backend services
-            response_data = self._process_intent(entities, detected_language)
+            response_data = await asyncio.to_thread(self._process_intent, entities, detected_language)
             
             # Step 4: Generate response text
             response_text = self.tts_handler.generate_response(
@@ -78,41 +347,88 @@ class VoiceAssistant:
             )
             
             # Step 5: Convert response to speech
-            tts_result = self.tts_handler.text_to_speech(response_text, detected_language)
+            tts_result = await self.tts_handler.text_to_speech_async(response_text, detected_language)
             
             # Step 6: Send AI agent notification if requested
             ai_result = None
             if user_whatsapp:
-                ai_result = self._send_ai_notification(
+                ai_result = self._queue_ai_notification(
                     user_whatsapp, entities, response_data, detected_language
                 )
+            self._cache_response(cache_key, entities, response_data, response_text, tts_result)
             
-            return {
-                'success': True,
-                'transcription': {
-                    'text': text,
-                    'language': detected_language,
-                    'confidence': transcription_result['confidence']
-                },
-                'entities': entities,
-                'response': {
-                    'text': response_text,
-                    'audio_data': tts_result.get('audio_data'),
-                    'tts_success': tts_result['success']
-                },
-                'backend_result': response_data,
-                'ai_result': ai_result,
-                'timestamp': datetime.utcnow().isoformat()
-            }
+            return self._create_voice_response(
+                transcription_result, entities, response_text, tts_result, response_data, ai_result
+            )
             
         except Exception as e:
             logger.error(f"Error processing voice input: {e}")
-            return self._create_error_response(
+            return await asyncio.to_thread(
+                self._create_error_response,
                 "Processing failed", 
                 str(e), 
                 language_hint or 'en'
             )
     
+    @staticmethod
+    def _response_cache_key(text: str, language: str) -> bytes:
+        return hashlib.blake2b(f"{text.strip()}|{language}".encode('utf-8'), digest_size=16).digest()
+    
+    def _get_cached_response(self, key: bytes) -> Optional[tuple]:
+        with self._response_cache_lock:
+            entry = self._response_cache.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._response_cache[key]
+                return None
+            self._response_cache.move_to_end(key)
+            entities, response_data, response_text, tts_result = entry[1:]
+        # Callers get their own copies, as with extract_medical_entities
+        return copy.deepcopy(entities), copy.deepcopy(response_data), response_text, dict(tts_result)
+    
+    def _cache_response(self, key: bytes, entities: Dict[str, Any], response_data: Dict[str, Any],
+                        response_text: str, tts_result: Dict[str, Any]) -> None:
+        """
+        Remember a completed turn, unless it had side effects or failed
+        """
+        if entities['intent'] in UNCACHEABLE_INTENTS or not response_data.get('success') or not tts_result.get('success'):
+            return
+        # Snapshot the turn so the caller's later changes don't leak in
+        entry = (
+            time.monotonic() + RESPONSE_CACHE_TTL,
+            copy.deepcopy(entities), copy.deepcopy(response_data), response_text, dict(tts_result)
+        )
+        with self._response_cache_lock:
+            self._response_cache[key] = entry
+            self._response_cache.move_to_end(key)
+            while len(self._response_cache) > RESPONSE_CACHE_MAX_ENTRIES:
+                self._response_cache.popitem(last=False)
+    
+    def _create_voice_response(self, transcription_result: Dict[str, Any], entities: Dict[str, Any],
+                               response_text: str, tts_result: Dict[str, Any],
+                               response_data: Dict[str, Any], ai_result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Assemble the successful pipeline response
+        """
+        return {
+            'success': True,
+            'transcription': {
+                'text': transcription_result['text'],
+                'language': transcription_result['language'],
+                'confidence': transcription_result['confidence']
+            },
+            'entities': entities,
+            'response': {
+                'text': response_text,
+                'audio_data': tts_result.get('audio_data'),
+                'tts_success': tts_result['success']
+            },
+            'backend_result': response_data,
+            'ai_result': ai_result,
+            'timestamp': datetime.now(_UTC).isoformat()
+        }
+    
     def _process_intent(self, entities: Dict[str, Any], language: str) -> Dict[str, Any]:
         """
         Process user intent and call appropriate backend services
@@ -120,16 +436,7 @@ class VoiceAssistant:
         intent = entities['intent']
         
         try:
-            if intent == 'heart':
-                return self._handle_heart_prediction(entities)
-            elif intent == 'alzheimer':
-                return self._handle_alzheimer_prediction(entities)
-            elif intent == 'appointment':
-                return self._handle_appointment_booking(entities)
-            elif intent == 'contact':
-                return self._handle_doctor_contact(entities)
-            else:
-                return self._handle_general_query(entities)
+            return self._intent_handlers.get(intent, self._handle_general_query)(entities)
                 
         except Exception as e:
             logger.error(f"Error processing intent '{intent}': {e}")
@@ -137,10 +444,27 @@ class VoiceAssistant:
                 'success': False,
                 'error': str(e),
                 'response_params': {
-                    'symptoms': ', '.join(entities.get('symptoms', []))
+                    'symptoms': _symptoms_joined(entities)
                 }
             }
     
+    def _post_json(self, endpoint: str, payload: Dict[str, Any]) -> requests.Response:
+        """
+        POST a JSON payload to one of the backend endpoints, within that
+        endpoint's (connect, read) timeout
+        """
+        url = self.api_endpoints[endpoint]
+        timeout = self.api_timeouts[endpoint]
+        try:
+            if ORJSON_AVAILABLE:
+                return self._http.post(url, data=orjson.dumps(payload), headers=JSON_HEADERS, timeout=timeout)
+            return self._http.post(url, json=payload, timeout=timeout)
+        except requests.exceptions.Timeout:
+            with self._timeout_counts_lock:
+                self._timeout_counts[endpoint] += 1
+            logger.warning("Backend call to %s timed out after %s s", endpoint, timeout)
+            raise
+    
     def _handle_heart_prediction(self, entities: Dict[str, Any]) -> Dict[str, Any]:
         """
         Handle heart disease prediction request
@@ -149,21 +473,17 @@ class VoiceAssistant:
             # Create feature vector for heart prediction
             # Default values based on extracted entities
             age = entities.get('age', 50)
-            sex = 1 if 'male' in str(entities.get('symptoms', [])).lower() else 0
+            symptoms = entities.get('symptoms', [])
+            sex = 1 if 'male' in str(symptoms).lower() else 0
             
             # Map symptoms to heart disease features
-            symptoms = entities.get('symptoms', [])
             features = self._map_symptoms_to_heart_features(symptoms, age, sex)
             
             # Call backend API
-            response = requests.post(
-                self.api_endpoints['heart_prediction'],
-                json=features,
-                timeout=30
-            )
+            response = self._post_json('heart_prediction', features)
             
             if response.status_code == 200:
-                result = response.json()
+                result = _response_json(response)
                 return {
                     'success': True,
                     'prediction_type': 'heart',
@@ -179,7 +499,7 @@ class VoiceAssistant:
                 return {
                     'success': False,
                     'error': f'Backend API error: {response.status_code}',
-                    'response_params': {'symptoms': ', '.join(symptoms)}
+                    'response_params': {'symptoms': _symptoms_joined(entities)}
                 }
                 
         except Exception as e:
@@ -187,7 +507,7 @@ class VoiceAssistant:
             return {
                 'success': False,
                 'error': str(e),
-                'response_params': {'symptoms': ', '.join(entities.get('symptoms', []))}
+                'response_params': {'symptoms': _symptoms_joined(entities)}
             }
     
     def _handle_alzheimer_prediction(self, entities: Dict[str, Any]) -> Dict[str, Any]:
@@ -200,14 +520,10 @@ class VoiceAssistant:
             features = self._map_symptoms_to_alzheimer_features(entities.get('symptoms', []), age)
             
             # Call backend API
-            response = requests.post(
-                self.api_endpoints['alzheimer_prediction'],
-                json=features,
-                timeout=30
-            )
+            response = self._post_json('alzheimer_prediction', features)
             
             if response.status_code == 200:
-                result = response.json()
+                result = _response_json(response)
                 return {
                     'success': True,
                     'prediction_type': 'alzheimer',
@@ -224,7 +540,7 @@ class VoiceAssistant:
                 return {
                     'success': False,
                     'error': f'Backend API error: {response.status_code}',
-                    'response_params': {'symptoms': ', '.join(entities.get('symptoms', []))}
+                    'response_params': {'symptoms': _symptoms_joined(entities)}
                 }
                 
         except Exception as e:
@@ -232,7 +548,7 @@ class VoiceAssistant:
             return {
                 'success': False,
                 'error': str(e),
-                'response_params': {'symptoms': ', '.join(entities.get('symptoms', []))}
+                'response_params': {'symptoms': _symptoms_joined(entities)}
             }
     
     def _handle_appointment_booking(self, entities: Dict[str, Any]) -> Dict[str, Any]:
@@ -251,16 +567,21 @@ class VoiceAssistant:
                 'department': entities.get('department', 'General Medicine')
             }
             
-            # Call backend API (if exists)
+            # Call backend API (if exists and not known to be down)
+            breaker = self._breakers['book_appointment']
+            if not breaker.allow_request():
+                return self._simulate_appointment_booking(appointment_data)
+            
             try:
-                response = requests.post(
-                    self.api_endpoints['book_appointment'],
-                    json=appointment_data,
-                    timeout=30
-                )
+                response = self._post_json('book_appointment', appointment_data)
+                
+                if response.status_code == 404:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
                 
                 if response.status_code == 200:
-                    result = response.json()
+                    result = _response_json(response)
                     return {
                         'success': True,
                         'prediction_type': 'appointment',
@@ -272,6 +593,7 @@ class VoiceAssistant:
                     return self._simulate_appointment_booking(appointment_data)
                     
             except requests.exceptions.RequestException:
+                breaker.record_failure()
                 # Fallback: simulate appointment booking
                 return self._simulate_appointment_booking(appointment_data)
                 
@@ -298,16 +620,21 @@ class VoiceAssistant:
                 'message': entities.get('raw_text', '')
             }
             
-            # Call backend API (if exists)
+            # Call backend API (if exists and not known to be down)
+            breaker = self._breakers['contact_doctor']
+            if not breaker.allow_request():
+                return self._simulate_doctor_contact(contact_data)
+            
             try:
-                response = requests.post(
-                    self.api_endpoints['contact_doctor'],
-                    json=contact_data,
-                    timeout=30
-                )
+                response = self._post_json('contact_doctor', contact_data)
+                
+                if response.status_code == 404:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
                 
                 if response.status_code == 200:
-                    result = response.json()
+                    result = _response_json(response)
                     return {
                         'success': True,
                         'prediction_type': 'contact',
@@ -319,6 +646,7 @@ class VoiceAssistant:
                     return self._simulate_doctor_contact(contact_data)
                     
             except requests.exceptions.RequestException:
+                breaker.record_failure()
                 # Fallback: simulate doctor notification
                 return self._simulate_doctor_contact(contact_data)
                 
@@ -339,7 +667,7 @@ class VoiceAssistant:
             'prediction_type': 'general',
             'result': {'message': 'General query received'},
             'response_params': {
-                'symptoms': ', '.join(entities.get('symptoms', []))
+                'symptoms': _symptoms_joined(entities)
             }
         }
     
@@ -365,20 +693,7 @@ class VoiceAssistant:
         }
         
         # Map symptoms to features
-        symptoms_lower = [s.lower() for s in symptoms]
-        
-        if 'chest' in ' '.join(symptoms_lower) or 'pain' in ' '.join(symptoms_lower):
-            features['cp'] = 2  # Typical angina
-        if 'pressure' in ' '.join(symptoms_lower) or 'high' in ' '.join(symptoms_lower):
-            features['trestbps'] = 140
-        if 'cholesterol' in ' '.join(symptoms_lower) or 'fat' in ' '.join(symptoms_lower):
-            features['chol'] = 250
-        if 'diabetes' in ' '.join(symptoms_lower) or 'sugar' in ' '.join(symptoms_lower):
-            features['fbs'] = 1
-        if 'exercise' in ' '.join(symptoms_lower) or 'angina' in ' '.join(symptoms_lower):
-            features['exang'] = 1
-        
-        return features
+        return _apply_symptom_rules(features, symptoms, HEART_SYMPTOM_RULES)
     
     def _map_symptoms_to_alzheimer_features(self, symptoms: List[str], age: int) -> Dict[str, Any]:
         """
@@ -396,18 +711,7 @@ class VoiceAssistant:
         }
         
         # Map symptoms to features
-        symptoms_lower = [s.lower() for s in symptoms]
-        
-        if 'memory' in ' '.join(symptoms_lower) or 'forget' in ' '.join(symptoms_lower):
-            features['mmse'] = 22  # Lower MMSE score
-        if 'severe' in ' '.join(symptoms_lower) or 'advanced' in ' '.join(symptoms_lower):
-            features['mmse'] = 15
-            features['nwbv'] = 0.7
-        if 'mild' in ' '.join(symptoms_lower):
-            features['mmse'] = 25
-            features['nwbv'] = 0.75
-        
-        return features
+        return _apply_symptom_rules(features, symptoms, ALZHEIMER_SYMPTOM_RULES)
     
     def _simulate_appointment_booking(self, appointment_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -417,7 +721,7 @@ class VoiceAssistant:
             'success': True,
             'prediction_type': 'appointment',
             'result': {
-                'appointment_id': f"APT{datetime.now().strftime('%Y%m%d%H%M%S')}",
+                'appointment_id': f"APT{time.time_ns():x}",
                 'status': 'confirmed',
                 'appointment_date': '2024-01-15',
                 'appointment_time': '10:00 AM',
@@ -435,7 +739,7 @@ class VoiceAssistant:
             'success': True,
             'prediction_type': 'contact',
             'result': {
-                'contact_id': f"CNT{datetime.now().strftime('%Y%m%d%H%M%S')}",
+                'contact_id': f"CNT{time.time_ns():x}",
                 'status': 'notified',
                 'doctor_assigned': 'Dr. Johnson',
                 'estimated_response_time': '2-4 hours'
@@ -443,6 +747,32 @@ class VoiceAssistant:
             'response_params': {}
         }
     
+    def _queue_ai_notification(self, user_whatsapp: str, entities: Dict[str, Any],
+                               response_data: Dict[str, Any], language: str) -> Dict[str, Any]:
+        """
+        Hand the AI agent notification to the background worker. If the
+        queue is full it is sent inline instead, which throttles the caller
+        """
+        try:
+            self._notification_queue.put_nowait((user_whatsapp, entities, response_data, language))
+        except queue.Full:
+            logger.warning("Notification queue full, sending inline")
+            return self._send_ai_notification(user_whatsapp, entities, response_data, language)
+        return {'success': True, 'queued': True}
+    
+    def _run_notification_worker(self) -> None:
+        while True:
+            batch = [self._notification_queue.get()]
+            while len(batch) < NOTIFICATION_BATCH_SIZE:
+                try:
+                    batch.append(self._notification_queue.get_nowait())
+                except queue.Empty:
+                    break
+            for job in batch:
+                if job is None:
+                    return
+                self._send_ai_notification(*job)
+    
     def _send_ai_notification(self, user_whatsapp: str, entities: Dict[str, Any], 
                              response_data: Dict[str, Any], language: str) -> Dict[str, Any]:
         """
@@ -492,29 +822,26 @@ class VoiceAssistant:
                 'audio_data': tts_result.get('audio_data'),
                 'tts_success': tts_result['success']
             },
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': datetime.now(_UTC).isoformat()
         }
     
+    def close(self) -> None:
+        """
+        Deliver queued notifications and release pooled backend connections
+        """
+        self._notification_queue.put(None)
+        self._notification_worker.join()
+        self._http.close()
+    
     def get_status(self) -> Dict[str, Any]:
         """
         Get status of all voice assistant components
         """
         return {
-            'speech_recognition': {
-                'available': True,
-                'supported_languages': list(self.speech_handler.language_codes.keys())
-            },
-            'text_to_speech': {
-                'available': True,
-                'supported_languages': list(self.tts_handler.language_codes.keys()),
-                'offline_available': self.tts_handler.offline_available
-            },
+            **self._static_status,
             'ai_agent': {
                 'available': True,
                 'status': self.ai_agent.get_status()
             },
-            'backend_endpoints': {
-                endpoint: f"{self.base_url}{path}" 
-                for endpoint, path in self.api_endpoints.items()
-            }
+            'backend_timeouts': dict(self._timeout_counts)
         }